@@ -0,0 +1,274 @@
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import zipfile
+
+import controller
+from kopyt import node
+
+
+def generate_kotlin_source(seed, classes=3, methods=10, properties=8, nesting=3, chain=4):
+    """
+    Buat source Kotlin sintetis yang deterministik (seed yang sama = source yang sama).
+    Setiap class punya properties property dan methods method; body method berisi
+    if/for bersarang sedalam nesting, chain call sepanjang chain, akses property,
+    dan pemanggilan method lain di file yang sama.
+    """
+    rng = random.Random(seed)
+    lines = [f"package bench.pkg{seed % 10}", "", f"interface Listener{seed} {{", "    fun onEvent(value: Int)", "}", ""]
+    for c in range(classes):
+        lines.append(f"class Generated{seed}x{c} {{")
+        for p in range(properties):
+            lines.append(f"    private var prop{p}: Int = {p}")
+        for m in range(methods):
+            lines.append(f"    fun method{m}(arg: Int): Int {{")
+            lines.append("        var total = arg")
+            indent = "        "
+            for depth in range(nesting):
+                keyword = "if (total > %d)" % depth if depth % 2 == 0 else "for (i in 0..%d)" % depth
+                lines.append(f"{indent}{keyword} {{")
+                indent += "    "
+            for p in rng.sample(range(properties), min(properties, 3)):
+                lines.append(f"{indent}total += prop{p}")
+            if methods > 1:
+                lines.append(f"{indent}total += method{rng.randrange(methods)}(total)")
+            for depth in range(nesting):
+                indent = indent[:-4]
+                lines.append(f"{indent}}}")
+            if chain > 0:
+                calls = ".".join(f"step{i}()" for i in range(chain))
+                lines.append(f"        val chained = builder.{calls}")
+            lines.append(f"        this.prop0 = total")
+            lines.append("        return total")
+            lines.append("    }")
+        lines.append("}")
+        lines.append("")
+    lines.append(f"fun topLevel{seed}(x: Int): Int {{")
+    lines.append("    return if (x > 0) x else -x")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(files=20, **kwargs):
+    """Return list (nama file, source) untuk files file Kotlin sintetis."""
+    return [(f"src/bench/File{i}.kt", generate_kotlin_source(i, **kwargs)) for i in range(files)]
+
+
+class _Upload(io.BytesIO):
+    # Meniru objek upload Streamlit (punya name dan getbuffer())
+    name = "bench.zip"
+
+
+def build_archive(corpus):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, code in corpus:
+            archive.writestr(name, code)
+    return buffer.getvalue()
+
+
+def _best_time(func, repeat, setup=None):
+    # setup dijalankan sebelum setiap pengulangan dan tidak ikut diukur
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _method_inputs(analyses):
+    inputs = []
+    for analysis in analyses:
+        names = controller.MethodNameIndex(analysis.non_accessor_methods)
+        for class_decl in analysis.class_decls:
+            if not class_decl.body:
+                continue
+            for member in class_decl.body.members:
+                if isinstance(member, node.FunctionDeclaration):
+                    body = analysis.render(member.body) if member.body else ""
+                    inputs.append((class_decl, member, body, names))
+    return inputs
+
+
+def run_benchmarks(corpus, repeat=3, workers=1):
+    """Jalankan semua benchmark untuk corpus dan return dict hasil (detik dan throughput)."""
+    results = {}
+    n_files = len(corpus)
+
+    def record(name, seconds, count, unit):
+        results[name] = {
+            "seconds": seconds,
+            "count": count,
+            "unit": unit,
+            "per_second": count / seconds if seconds > 0 else float("inf"),
+        }
+
+    record("parse", _best_time(lambda: [controller.FileAnalysis(name, code) for name, code in corpus], repeat),
+           n_files, "files")
+    # Mode lexical (tanpa parse kopyt) untuk dibandingkan dengan parse
+    record("lexical_record", _best_time(lambda: [controller.lexical_record(name, code) for name, code in corpus], repeat),
+           n_files, "files")
+    analyses = [controller.FileAnalysis(name, code) for name, code in corpus]
+    inputs = _method_inputs(analyses)
+    n_methods = len(inputs)
+
+    # Cache token stream per body (method_tokens) dikosongkan sebelum setiap pengulangan, supaya
+    # metrik teks selalu diukur termasuk strip + tokenize, bukan cache hit dari pengulangan sebelumnya
+    cold = controller.method_tokens.cache_clear
+    metric_functions = {
+        "method_tokens": lambda: [controller.method_tokens(body) for _, _, body, _ in inputs],
+        "count_cm_method": lambda: [controller.count_cm_method(body, names) for _, _, body, names in inputs],
+        "noav_method": lambda: [controller.noav_method(cls, member) for cls, member, _, _ in inputs],
+        "count_noav": lambda: [controller.count_noav(cls, body, member) for cls, member, body, _ in inputs],
+        "body_metrics": lambda: [controller.body_metrics(member.body) for _, member, _, _ in inputs],
+        "count_cc_manual": lambda: [controller.count_cc_manual(body) for _, _, body, _ in inputs],
+        "manual_max_nesting": lambda: [controller.manual_max_nesting(body) for _, _, body, _ in inputs],
+        "count_mamcl": lambda: [controller.count_mamcl(body) for _, _, body, _ in inputs],
+    }
+    for name, func in metric_functions.items():
+        record(name, _best_time(func, repeat, cold), n_methods, "methods")
+
+    record("extracted_method",
+           _best_time(lambda: [controller.extracted_method(name, analysis) for (name, _), analysis in zip(corpus, analyses)],
+                      repeat, cold),
+           n_methods, "methods")
+
+    records = controller.analyze_kotlin_sources(corpus)
+    controller.aggregate_package_metrics(records)  # pemanasan: import pandas tidak ikut diukur
+    record("aggregate_package_metrics", _best_time(lambda: controller.aggregate_package_metrics(records), repeat),
+           n_files, "files")
+
+    archive = build_archive(corpus)
+    record("extract_and_parse",
+           _best_time(lambda: controller.extract_and_parse(_Upload(archive), workers=workers), repeat, cold),
+           n_files, "files")
+
+    cold()
+    tracemalloc.start()
+    controller.extract_and_parse(_Upload(archive), workers=workers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["extract_and_parse"]["peak_memory_bytes"] = peak
+    results["extract_and_parse"]["methods_per_second"] = n_methods / results["extract_and_parse"]["seconds"]
+    return results
+
+
+# Modul berat yang seharusnya tidak ikut ter-import saat startup
+HEAVY_MODULES = ("pandas", "numpy", "patoolib", "kopyt", "pyarrow")
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_startup(module, repeat=5):
+    """
+    Waktu cold import module di interpreter baru (terbaik dari repeat kali), beserta
+    modul berat yang ikut ter-import. Dijalankan di subprocess supaya cache import
+    proses ini tidak mempengaruhi hasil.
+    """
+    script = _STARTUP_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, check=True).stdout
+        result = json.loads(output)
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def run_startup_benchmarks(repeat=5, modules=("metrics", "controller")):
+    """Benchmark cold import untuk setiap modul (format hasil sama dengan run_benchmarks)."""
+    results = {}
+    for module in modules:
+        startup = measure_startup(module, repeat)
+        results[f"import_{module}"] = {
+            "seconds": startup["seconds"],
+            "count": 1,
+            "unit": "imports",
+            "per_second": 1 / startup["seconds"] if startup["seconds"] > 0 else float("inf"),
+            "loaded": startup["loaded"],
+        }
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold=0.10):
+    """Return list (nama, rasio) untuk benchmark yang lebih lambat dari baseline lebih dari threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("seconds"):
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fungsi metrik dan pipeline extract_and_parse.")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--methods", type=int, default=10)
+    parser.add_argument("--properties", type=int, default=8)
+    parser.add_argument("--nesting", type=int, default=3)
+    parser.add_argument("--chain", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--baseline", help="file JSON baseline untuk dibandingkan")
+    parser.add_argument("--save-baseline", action="store_true", help="simpan hasil sebagai baseline baru")
+    parser.add_argument("--threshold", type=float, default=0.10, help="batas regresi (0.10 = 10%% lebih lambat)")
+    parser.add_argument("--startup-only", action="store_true", help="hanya ukur waktu cold import")
+    args = parser.parse_args(argv)
+
+    config = {key: getattr(args, key) for key in ("files", "classes", "methods", "properties", "nesting", "chain")}
+    results = run_startup_benchmarks(repeat=max(args.repeat, 5))
+    if not args.startup_only:
+        corpus = generate_corpus(**config)
+        results.update(run_benchmarks(corpus, repeat=args.repeat, workers=args.workers))
+
+    print(f"{'benchmark':<20}{'seconds':>12}{'throughput':>22}")
+    for name, result in results.items():
+        throughput = f"{result['per_second']:.1f} {result['unit']}/s"
+        print(f"{name:<20}{result['seconds']:>12.4f}{throughput:>22}")
+    for name, result in results.items():
+        if "loaded" in result:
+            print(f"{name}: {result['seconds'] * 1000:.1f} ms, modul berat ter-import: {', '.join(result['loaded']) or '-'}")
+    if "extract_and_parse" in results:
+        e2e = results["extract_and_parse"]
+        print(f"end-to-end: {e2e['methods_per_second']:.1f} methods/s, peak memory {e2e['peak_memory_bytes'] / 1e6:.1f} MB")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"baseline disimpan ke {args.baseline}")
+        return 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("peringatan: konfigurasi corpus berbeda dengan baseline")
+        regressions = compare_with_baseline(results, baseline["results"], args.threshold)
+        for name, ratio in regressions:
+            print(f"REGRESI {name}: {ratio:.2f}x lebih lambat dari baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,119 +1,206 @@
+import contextlib
+import dataclasses
+import fnmatch
+import hashlib
+import importlib
+import io
+import itertools
+import json
 import os
+import re
+import subprocess
+import tarfile
 import tempfile
-import patoolib
-import pandas as pd
-from kopyt import Parser, node
-import re 
-
-def manual_max_nesting(code):
-    indent_stack = []
-    max_depth = 0
-    for line in code.split("\n"):
-        line = line.strip()
-        if line.startswith(("if", "for", "while", "catch", "when", "try", "else")):
-            indent_stack.append(line)
-            max_depth = max(max_depth, len(indent_stack))
-        elif line == "}":
-            if indent_stack:
-                indent_stack.pop()
-    return max_depth
-
-def count_cc_manual(code):
-    cc = 1
-    control_keywords = ["if", "for", "while", "when", "catch", "case"]
-    for line in code.split("\n"):
-        line = line.strip()
-        for kw in control_keywords:
-            if line.startswith(kw):
-                cc += 1
-    return cc
-
-def count_woc(cc_values):
-    total = sum(cc_values)
-    return [cc / total if total > 0 else 0 for cc in cc_values]
-
-def count_mamcl(code):
-    max_chain = 0
-    lines = code.splitlines()
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith(("//", "/*", "*", "*/")):
-            continue
-            
-        # Cari semua chain method calls dalam satu baris
-        current_chain = 0
-        parts = line.split(".")
-        if len(parts) > 1:
-            # Mulai dari index 1 karena index 0 adalah objek
-            for part in parts[1:]:
-                # Check if it's a method call (contains parentheses)
-                if "(" in part and ")" in part:
-                    current_chain += 1
-                else:
-                    # Reset if not a method call, as the chain is broken
-                    current_chain = 0
-                    break # Stop processing this line as chain is broken
-        max_chain = max(max_chain, current_chain)
+import time
+import zipfile
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from metric_cache import MetricCache
+from metrics import (IDENTIFIER_RE, NOAV_KEYWORDS, IdentifierIndex, MethodNameIndex, TokenStream, count_cm_method,
+                     count_loc_type, count_woc, kotlin_tokens, lexical_body_metrics, method_tokens, scan_declarations,
+                     strip_comments_and_strings)
+# Re-export: metrik manual tetap bisa dipanggil lewat controller (mis. controller.count_cc_manual di benchmark.py)
+from metrics import call_site_index, count_cc_manual, count_mamcl, manual_max_nesting  # noqa: F401
+from profiling import Profiler, stage
+
+
+class _LazyModule:
+    """
+    Pengganti modul yang baru di-import saat atribut pertamanya diakses.
+    pandas, numpy, patoolib, dan kopyt mahal di-import, padahal tidak semua pemanggil
+    controller membutuhkannya. Atribut yang sudah diambil disimpan di instance,
+    jadi akses berikutnya sama cepatnya dengan akses modul biasa.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+
+pd = _LazyModule("pandas")
+np = _LazyModule("numpy")
+patoolib = _LazyModule("patoolib")
+kopyt = _LazyModule("kopyt")
+node = _LazyModule("kopyt.node")
+
+# Kolom hasil extract_and_parse / extracted_method
+METRIC_COLUMNS = ["Package", "Class", "Method", "LOC", "Max Nesting", "CC", "WOC", "MaMCL", "NOAV", "CM",
+                  "LOC_type", "LOCNAMM_type", "CFNAMM_type", "WMC_type", "NOMNAMM_Package", "NOI_Package",
+                  "LOC_package", "Error", "Mode"]
+
+# Naikkan jika cara hitung metrik berubah, supaya isi cache lama tidak dipakai lagi
+ANALYZER_VERSION = "9"
+
+# Node kopyt yang menambah cabang keputusan (CC) dan yang membuka level nesting baru
+# (diisi saat pertama dipakai supaya kopyt tidak di-import ketika modul di-load)
+_DECISION_NODES = None
+_NESTING_NODES = None
+
+
+def _node_types():
+    global _DECISION_NODES, _NESTING_NODES
+    if _DECISION_NODES is None:
+        _DECISION_NODES = (node.IfExpression, node.ForStatement, node.WhileStatement,
+                           node.DoWhileStatement, node.WhenExpression, node.CatchBlock)
+        _NESTING_NODES = (node.IfExpression, node.ForStatement, node.WhileStatement,
+                          node.DoWhileStatement, node.WhenExpression, node.TryExpression)
+    return _DECISION_NODES, _NESTING_NODES
+
+_CHILD_FIELDS = {}
+
+
+def _child_fields(node_type):
+    fields = _CHILD_FIELDS.get(node_type)
+    if fields is None:
+        fields = tuple(f.name for f in dataclasses.fields(node_type) if f.name != "position")
+        _CHILD_FIELDS[node_type] = fields
+    return fields
+
+
+def _iter_children(current):
+    for field_name in _child_fields(type(current)):
+        value = getattr(current, field_name)
+        if isinstance(value, node.Node):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                if isinstance(item, node.Node):
+                    yield item
+
+
+def _else_if(if_expr):
+    # "else if" ditulis kopyt sebagai IfExpression di else_body (kadang dibungkus Statement)
+    else_body = if_expr.else_body
+    if isinstance(else_body, node.Statement):
+        else_body = else_body.statement
+    return else_body if isinstance(else_body, node.IfExpression) else None
+
+
+def _call_chain_length(postfix_expr):
+    # Chain = rangkaian ".nama(...)" berturut-turut; navigasi tanpa call memutus chain
+    max_chain = current_chain = 0
+    suffixes = postfix_expr.suffixes
+    for i, suffix in enumerate(suffixes):
+        if isinstance(suffix, node.NavigationSuffix):
+            if i + 1 < len(suffixes) and isinstance(suffixes[i + 1], node.CallSuffix):
+                current_chain += 1
+                max_chain = max(max_chain, current_chain)
+            else:
+                current_chain = 0
     return max_chain
 
 
-def count_cm_method(method_code, all_methods_in_file):
-    """Count Coupling between Methods (CM)"""
-    count = 0
-    method_lines = method_code.splitlines()
-    
-    for method_name in all_methods_in_file:
-        # We need to make sure we are looking for actual calls, not just substrings
-        # and not the method itself if it's currently being analyzed.
-        # This is a heuristic. A full AST-based approach would be more robust.
-        
-        # Avoid counting the method itself as coupling with itself
-        # This check is heuristic and might miss cases.
-        # Example: if method 'foo' calls 'this.foo()', it would still be counted by simple string match.
-        # For simplicity, we assume 'method_name' is usually unique enough here.
-        
-        for line in method_lines:
-            line = line.strip()
-            if not line or line.startswith(("//", "/*", "*", "*/")):
-                continue
-                
-            # A more robust check for method calls.
-            # Look for "methodName(" or "methodName ("
-            # This avoids matching if "methodName" is just part of a variable name.
-            if re.search(r'\b' + re.escape(method_name) + r'\s*\(', line):
-                count += 1
-                break  # Count once per distinct method called within the current method
-    return count
+class MetricsVisitor:
+    """
+    Hitung CC, max nesting, dan MaMCL dari AST kopyt dalam satu traversal,
+    tanpa mengubah AST kembali menjadi teks.
+
+    - CC: 1 + jumlah if, for, while, do-while, when, dan catch
+    - Max Nesting: kedalaman maksimum if/for/while/do-while/when/try
+      ("else if" dihitung di level yang sama dengan if-nya)
+    - MaMCL: panjang maksimum chain method call (a.b().c().d() = 3)
+    """
+
+    def __init__(self):
+        self.cc = 1
+        self.max_nesting = 0
+        self.mamcl = 0
+
+    def visit(self, root):
+        if root is None:
+            return self
+        decision_nodes, nesting_nodes = _node_types()
+        stack = [(root, 0)]
+        while stack:
+            current, depth = stack.pop()
+            if isinstance(current, decision_nodes):
+                self.cc += 1
+            if isinstance(current, nesting_nodes):
+                depth += 1
+                if depth > self.max_nesting:
+                    self.max_nesting = depth
+            if isinstance(current, node.PostfixUnaryExpression):
+                chain = _call_chain_length(current)
+                if chain > self.mamcl:
+                    self.mamcl = chain
+
+            else_if = _else_if(current) if isinstance(current, node.IfExpression) else None
+            for child in _iter_children(current):
+                if else_if is not None and (child is current.else_body):
+                    stack.append((else_if, depth - 1))
+                else:
+                    stack.append((child, depth))
+        return self
 
 
-def count_loc_type(class_code):
-    return class_code.count("\n") + 1
+def body_metrics(body):
+    """Return (CC, Max Nesting, MaMCL) untuk body function (node kopyt atau None)."""
+    visitor = MetricsVisitor().visit(body)
+    return visitor.cc, visitor.max_nesting, visitor.mamcl
 
 
-def count_locnamm_type(class_decl):
+def count_locnamm_type(class_decl, render=str):
     count = 0
     if hasattr(class_decl, 'body') and class_decl.body and hasattr(class_decl.body, 'members'):
         for member in class_decl.body.members:
             if isinstance(member, node.FunctionDeclaration):
                 # Check if it's a non-accessor method
                 if not member.name.startswith(("get", "set", "is")):
-                    count += str(member.body).count("\n") + 1 if member.body else 0
+                    count += render(member.body).count("\n") + 1 if member.body else 0
     return count
 
-def count_cfnamm_type(class_decl):
+def count_cfnamm_type(class_decl, render=str):
+    """
+    Rasio method non-accessor di class yang memanggil method non-accessor lain di class
+    yang sama. Call site diambil dari token stream body (sama seperti CM), jadi nama
+    di dalam string atau komentar tidak dihitung.
+    """
     methods = []
     if hasattr(class_decl, 'body') and class_decl.body and hasattr(class_decl.body, 'members'):
-        for m in class_decl.body.members:
-            if isinstance(m, node.FunctionDeclaration) and not m.name.startswith(("get", "set", "is")):
-                methods.append(m.name)
+        methods = [m for m in class_decl.body.members
+                   if isinstance(m, node.FunctionDeclaration) and not m.name.startswith(("get", "set", "is"))]
+    names = set(m.name for m in methods)
+    escaped = [name for name in names if not IDENTIFIER_RE.fullmatch(name)]
     coupled = 0
-    if hasattr(class_decl, 'body') and class_decl.body and hasattr(class_decl.body, 'members'):
-        for m in class_decl.body.members:
-            if isinstance(m, node.FunctionDeclaration) and m.name in methods:
-                body = str(m.body)
-                # Check for calls to other non-accessor methods within the same class
-                if any(other_method_name != m.name and re.search(r'\b' + re.escape(other_method_name) + r'\s*\(', body) for other_method_name in methods):
-                    coupled += 1
+    for m in methods:
+        stream = method_tokens(render(m.body))
+        others = names - {m.name}
+        # Check for calls to other non-accessor methods within the same class
+        if not others.isdisjoint(stream.call_sites()) or any(
+                name != m.name and re.search(r'\b' + re.escape(name) + r'\s*\(', stream.code) for name in escaped):
+            coupled += 1
     return coupled / len(methods) if methods else 0
 
 def count_noav_class(class_decl):
@@ -132,7 +219,7 @@ def count_noav_class(class_decl):
                 pass 
     return count  # Total number of class-level attributes (properties/fields)
 
-def count_noav(class_node, method_code, method_node=None):
+def count_noav(class_node, method_code, method_node=None, index=None):
     """
     Menghitung NOAV (Number of Attributes Accessed in a Method) dengan benar.
     1. Kumpulkan semua nama atribut (property/field) dari class (termasuk companion object jika ada).
@@ -140,7 +227,11 @@ def count_noav(class_node, method_code, method_node=None):
     3. Exclude variabel lokal dan parameter method dari akses langsung.
     4. Intersect kedua set.
     5. Return jumlah hasil irisan.
+    index (IdentifierIndex) bisa diberikan jika sudah dibangun untuk method_code.
     """
+    if index is None:
+        index = IdentifierIndex(method_code)
+
     declared_vars = set()
 
     # 1. Kumpulkan semua nama atribut dari class (PropertyDeclaration dan VariableDeclaration)
@@ -169,40 +260,19 @@ def count_noav(class_node, method_code, method_node=None):
                             if hasattr(submember, 'name'):
                                 declared_vars.add(submember.name)
 
-    # 2. Kumpulkan semua nama variable yang diakses di method_code
-    accessed_vars = set()
-    # this.<var>
-    accessed_vars.update(re.findall(r'\bthis\.([a-zA-Z_][a-zA-Z0-9_]*)\b', method_code))
-    # super.<var>
-    accessed_vars.update(re.findall(r'\bsuper\.([a-zA-Z_][a-zA-Z0-9_]*)\b', method_code))
+    # 2. Kumpulkan semua nama variable yang diakses di method_code (this.<var> dan super.<var>)
+    accessed_vars = set(index.qualified)
 
     # 3. Exclude variabel lokal dan parameter method dari akses langsung
-    local_vars = set()
     param_vars = set()
     if method_node and hasattr(method_node, 'parameters'):
         for param in method_node.parameters:
             if hasattr(param, 'name'):
                 param_vars.add(param.name)
-    # Cari variabel lokal (val/var di dalam body method)
-    for match in re.finditer(r'\b(?:val|var)\s+([a-zA-Z_][a-zA-Z0-9_]*)', method_code):
-        local_vars.add(match.group(1))
 
     # akses langsung (bukan didahului titik/angka/huruf/underscore, dan bukan method call)
-    for match in re.finditer(r'(?<![\w\.])([a-zA-Z_][a-zA-Z0-9_]*)\b', method_code):
-        varname = match.group(1)
-        idx = match.end()
-        after = method_code[idx:idx+1]
-        if after == '(':
-            continue
-        # Exclude keyword, angka, parameter, dan variabel lokal
-        keywords = {
-            "if", "for", "while", "when", "catch", "case", "else", "return", "val", "var", "fun",
-            "true", "false", "null", "override", "private", "public", "protected", "internal", "class",
-            "object", "interface", "companion", "constructor", "init", "super", "this", "in", "is", "as","do", "try", "finally", "throw", "typeof", "sealed", "data", "lateinit"
-        }
-        if varname in keywords or varname.isdigit() or varname in param_vars or varname in local_vars:
-            continue
-        accessed_vars.add(varname)
+    # Exclude keyword, parameter, dan variabel lokal
+    accessed_vars.update(index.direct - NOAV_KEYWORDS - param_vars - index.local_vars)
 
     # 4. Intersect
     intersected = declared_vars & accessed_vars
@@ -224,11 +294,12 @@ def get_class_properties(class_node):
                     props.add(member.name)
     return props
 
-def noav_method(class_node, method_node):
+def noav_method(class_node, method_node, index=None):
     """
     Menghitung jumlah atribut class yang diakses di seluruh body fungsi (NOAV), 
     tanpa tergantung pada nama method/parameter/lokal.
     Perbaikan: juga menghitung akses via this.<prop> dan akses langsung pada baris yang mengandung method call.
+    index (IdentifierIndex) bisa diberikan jika sudah dibangun untuk body method.
     """
     # Ambil semua property class
     class_props = set()
@@ -246,74 +317,360 @@ def noav_method(class_node, method_node):
         for param in method_node.parameters:
             if hasattr(param, 'name'):
                 param_vars.add(param.name)
-    local_vars = set()
-    body_str = str(method_node.body) if hasattr(method_node, 'body') and method_node.body else ""
-    for match in re.finditer(r'\b(?:val|var)\s+([a-zA-Z_][a-zA-Z0-9_]*)', body_str):
-        local_vars.add(match.group(1))
-
-    accessed = set()
-    # Cek akses this.<prop> dan super.<prop>
-    for prop in class_props:
-        if prop in param_vars or prop in local_vars:
+    body_str = None
+    if index is None:
+        body_str = str(method_node.body) if hasattr(method_node, 'body') and method_node.body else ""
+        index = IdentifierIndex(body_str)
+
+    candidates = class_props - param_vars - index.local_vars
+    # Akses this.<prop>, super.<prop>, maupun akses langsung semuanya muncul sebagai kata utuh di body
+    accessed = {prop for prop in candidates if prop in index.words}
+
+    # Nama dengan backtick bukan kata biasa, cek dengan regex seperti sebelumnya
+    for prop in candidates - accessed:
+        if IDENTIFIER_RE.fullmatch(prop):
             continue
-        # Cek akses this.<prop>
-        if re.search(r'\bthis\.' + re.escape(prop) + r'\b', body_str):
-            accessed.add(prop)
-        # Cek akses super.<prop>
-        if re.search(r'\bsuper\.' + re.escape(prop) + r'\b', body_str):
-            accessed.add(prop)
-        # Cek akses langsung (bukan bagian dari kata lain, bukan param/lokal)
-        # Perbaikan: hitung juga jika property dipakai dalam method call, assignment, atau argumen
-        # Contoh: unregisterReceiver(mMessageReceiver)
-        if re.search(r'\b' + re.escape(prop) + r'\b', body_str):
+        if body_str is None:
+            body_str = str(method_node.body) if hasattr(method_node, 'body') and method_node.body else ""
+        # Cari di teks tanpa komentar dan isi string, sama seperti index
+        stripped = method_tokens(body_str).code
+        if (re.search(r'\bthis\.' + re.escape(prop) + r'\b', stripped)
+                or re.search(r'\bsuper\.' + re.escape(prop) + r'\b', stripped)
+                or re.search(r'\b' + re.escape(prop) + r'\b', stripped)):
             accessed.add(prop)
     return len(accessed)
 
 
-def extracted_method(file_path):
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            code = f.read()
-        parser = Parser(code)
-        result = parser.parse()
+def decode_source(data):
+    """
+    Decode isi file Kotlin dari bytes, sama seperti open(..., encoding="utf-8"):
+    UTF-8 dan newline dinormalisasi menjadi "\n".
+    """
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def is_kotlin_file(name):
+    return name.endswith(".kt") or name.endswith(".kts")
+
+
+# Folder hasil build dan kode generated yang biasanya tidak perlu dianalisis
+DEFAULT_EXCLUDES = (
+    "*/build/*",
+    "*/.gradle/*",
+    "*/generated/*",
+    "*/intermediates/*",
+    "*/tmp/kapt3/*",
+)
+
+
+def is_excluded(path, exclude=None):
+    """
+    True jika path cocok dengan salah satu pola glob di exclude (fnmatch, pemisah "/").
+    Pola "*/build/*" juga cocok untuk folder build di root ("build/...").
+    """
+    if not exclude:
+        return False
+    path = "/" + path.replace("\\", "/").lstrip("/")
+    return any(fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(path[1:], pattern) for pattern in exclude)
+
+
+def _iter_zip_sources(buffer, exclude=None, profiler=None):
+    # Waktu baca/dekompresi dicatat per member saat generator dikonsumsi, bukan saat dibuat
+    with stage(profiler, "extract"):
+        archive = zipfile.ZipFile(buffer)
+    with archive:
+        for info in archive.infolist():
+            if not info.is_dir() and is_kotlin_file(info.filename) and not is_excluded(info.filename, exclude):
+                with stage(profiler, "extract", info.filename):
+                    data = archive.read(info)
+                yield info.filename, data
+
+
+def _iter_tar_sources(buffer, exclude=None, profiler=None):
+    with stage(profiler, "extract"):
+        archive = tarfile.open(fileobj=buffer, mode="r:*")
+    with archive:
+        members = iter(archive)
+        while True:
+            # Di tar terkompresi, membaca header berikutnya ikut mendekompresi member yang dilewati
+            with stage(profiler, "extract"):
+                member = next(members, None)
+            if member is None:
+                return
+            if member.isfile() and is_kotlin_file(member.name) and not is_excluded(member.name, exclude):
+                with stage(profiler, "extract", member.name):
+                    data = archive.extractfile(member).read()
+                yield member.name, data
+
+
+def iter_archive_sources(file, exclude=None, profiler=None):
+    """
+    Baca file Kotlin (.kt/.kts) langsung dari arsip zip atau tar (.tar, .tar.gz, .tar.bz2, .tar.xz)
+    di memori, tanpa menulis arsip ke disk dan tanpa ekstrak ke temporary directory.
+    Menghasilkan generator (nama member, isi bytes), atau None jika format arsip tidak
+    didukung (rar, 7z, ...) sehingga pemanggil perlu memakai patoolib.
+    File yang cocok dengan pola glob di exclude dilewati sebelum isinya dibaca.
+    Jika profiler diberikan, waktu baca setiap member dicatat sebagai tahap "extract".
+    """
+    # File upload (BytesIO/UploadedFile) bisa di-seek, jadi dibaca langsung tanpa disalin
+    buffer = file
+    if not (hasattr(file, "seekable") and file.seekable()):
+        buffer = io.BytesIO(file.getbuffer() if hasattr(file, "getbuffer") else file.read())
+    buffer.seek(0)
+    if zipfile.is_zipfile(buffer):
+        buffer.seek(0)
+        return _iter_zip_sources(buffer, exclude, profiler)
+    buffer.seek(0)
+    if tarfile.is_tarfile(buffer):
+        buffer.seek(0)
+        return _iter_tar_sources(buffer, exclude, profiler)
+    return None
+
+
+class _SlotRecord:
+    # Basis record ringkas: atribut di __slots__, serialisasi sebagai list nilai sesuai urutan __slots__
+    __slots__ = ()
+
+    def to_list(self):
+        return [getattr(self, field) for field in self.__slots__]
+
+    def __reduce__(self):
+        # Pickle (IPC ke worker process) cukup menyimpan tuple nilai
+        return (type(self), tuple(self.to_list()))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_list() == other.to_list()
+
+    def __repr__(self):
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__ if field != "owner")
+        return f"{type(self).__name__}({values})"
+
+
+class PackageMetrics(_SlotRecord):
+    """Kontribusi satu file ke metrik package-level (NOMNAMM_Package, NOI_Package, LOC_Package)."""
+    __slots__ = ("nomnamm", "noi", "loc")
+
+    def __init__(self, nomnamm=0, noi=0, loc=0):
+        self.nomnamm = nomnamm
+        self.noi = noi
+        self.loc = loc
+
+    def as_dict(self):
+        return {'NOMNAMM_Package': self.nomnamm, 'NOI_Package': self.noi, 'LOC_Package': self.loc}
+
+
+class ClassMetrics(_SlotRecord):
+    """Metrik level class; satu objek dipakai bersama oleh semua MethodMetrics di class tersebut."""
+    __slots__ = ("package", "name", "loc_type", "locnamm_type", "cfnamm_type", "noav")
+
+    def __init__(self, package, name, loc_type=0, locnamm_type=0, cfnamm_type=0, noav=0):
+        self.package = package
+        self.name = name
+        self.loc_type = loc_type
+        self.locnamm_type = locnamm_type
+        self.cfnamm_type = cfnamm_type
+        self.noav = noav
+
+
+class MethodMetrics(_SlotRecord):
+    """
+    Satu baris hasil: metrik satu method beserta ClassMetrics pemiliknya (owner).
+    Baris khusus (Error, "None") memakai bentuk yang sama dengan error berisi pesan.
+    mode: "parsed" (AST kopyt) atau "lexical" (tokenizer saja, lihat lexical_record).
+    """
+    __slots__ = ("owner", "name", "loc", "max_nesting", "cc", "woc", "mamcl", "noav", "cm", "error", "mode")
+
+    def __init__(self, owner, name, loc=0, max_nesting=0, cc=0, woc=0, mamcl=0, noav=0, cm=0, error=None,
+                 mode="parsed"):
+        self.owner = owner
+        self.name = name
+        self.loc = loc
+        self.max_nesting = max_nesting
+        self.cc = cc
+        self.woc = woc
+        self.mamcl = mamcl
+        self.noav = noav
+        self.cm = cm
+        self.error = error
+        self.mode = mode
+
+    def replace(self, **changes):
+        values = dict(zip(self.__slots__, self.to_list()), **changes)
+        return MethodMetrics(**values)
+
+    def as_dict(self):
+        """Baris dalam bentuk dict (kolom METRIC_COLUMNS tanpa metrik package-level)."""
+        owner = self.owner
+        return {
+            "Package": owner.package,
+            "Class": owner.name,
+            "Method": self.name,
+            "LOC": self.loc,
+            "Max Nesting": self.max_nesting,
+            "CC": self.cc,
+            "WOC": self.woc,
+            "MaMCL": self.mamcl,
+            "NOAV": self.noav,
+            "CM": self.cm,
+            "LOC_type": owner.loc_type,
+            "LOCNAMM_type": owner.locnamm_type,
+            "CFNAMM_type": owner.cfnamm_type,
+            "Error": self.error,
+            "Mode": self.mode
+        }
+
+
+def error_row(method, error, package="Error", class_name="Error"):
+    """Baris Error (semua metrik 0) untuk file/method yang gagal dianalisis."""
+    return MethodMetrics(ClassMetrics(package, class_name), method, error=error)
+
+
+def encode_record(record):
+    """
+    Record -> bentuk yang bisa di-JSON (untuk cache dan ProjectIndex.save): ClassMetrics
+    disimpan sekali per class, setiap baris menjadi list [index class, nilai metrik...].
+    """
+    owners = {}
+    classes = []
+    rows = []
+    for row in record["rows"]:
+        index = owners.get(id(row.owner))
+        if index is None:
+            index = owners[id(row.owner)] = len(classes)
+            classes.append(row.owner.to_list())
+        values = row.to_list()
+        values[0] = index
+        rows.append(values)
+    package_metrics = record["package_metrics"]
+    return dict(record, classes=classes, rows=rows,
+                package_metrics=package_metrics.to_list() if package_metrics is not None else None)
+
+
+def decode_record(data):
+    """Kebalikan encode_record."""
+    classes = [ClassMetrics(*values) for values in data["classes"]]
+    record = {key: value for key, value in data.items() if key != "classes"}
+    record["rows"] = [MethodMetrics(classes[values[0]], *values[1:]) for values in data["rows"]]
+    if data["package_metrics"] is not None:
+        record["package_metrics"] = PackageMetrics(*data["package_metrics"])
+    return record
+
+
+class FileAnalysis:
+    """
+    Hasil parse satu file Kotlin. File hanya di-parse sekali, lalu AST yang sama
+    dipakai untuk metrik method, class, dan package (tidak perlu parse ulang).
+    """
+
+    def __init__(self, file_path, code=None):
+        if code is None:
+            with open(file_path, "r", encoding="utf-8") as f:
+                code = f.read()
+        elif isinstance(code, bytes):
+            code = decode_source(code)
+        self.file_path = file_path
+        self.code = code
+        self.result = kopyt.Parser(code).parse()
 
         # Extract package name from AST or fallback to 'UNKNOWN'
+        result = self.result
         if hasattr(result, 'package') and result.package:
-            package_name = result.package.name if hasattr(result.package, 'name') else str(result.package)
+            self.package_name = result.package.name if hasattr(result.package, 'name') else str(result.package)
         else:
-            package_name = "UNKNOWN"
-        # --- PACKAGE-LEVEL METRICS ---
+            self.package_name = "UNKNOWN"
+
+        # Memo hasil render str(node) selama satu analisis (key: id node, AST tetap hidup di self.result)
+        self._renders = {}
+
         declarations = result.declarations if hasattr(result, 'declarations') else []
-        class_decls = [n for n in declarations if isinstance(n, node.ClassDeclaration)]
-        interface_decls = [n for n in declarations if isinstance(n, node.InterfaceDeclaration)]
-        function_decls = [n for n in declarations if isinstance(n, node.FunctionDeclaration)]
+        self.class_decls = [n for n in declarations if isinstance(n, node.ClassDeclaration)]
+        self.interface_decls = [n for n in declarations if isinstance(n, node.InterfaceDeclaration)]
+        self.function_decls = [n for n in declarations if isinstance(n, node.FunctionDeclaration)]
 
-        # --- PACKAGE-LEVEL METRICS ---
-        nomnamm_package = sum(1 for f in function_decls if not f.name.startswith(("get", "set", "is")))
-        for c in class_decls:
+        # Semua nama method non-accessor di file (untuk CM dan NOMNAMM)
+        self.non_accessor_methods = [f.name for f in self.function_decls if not f.name.startswith(("get", "set", "is"))]
+        for c in self.class_decls:
             if hasattr(c, 'body') and c.body and hasattr(c.body, 'members'):
                 for m in c.body.members:
                     if isinstance(m, node.FunctionDeclaration) and not m.name.startswith(("get", "set", "is")):
-                        nomnamm_package += 1
-        noi_package = len(interface_decls)
-        loc_package = code.count("\n") + 1
-
-        # Simpan metrik package-level dalam dictionary berdasarkan package_name
-        package_metrics_map = {
-            package_name: {
-                'NOMNAMM_Package': nomnamm_package,
-                'NOI_Package': noi_package,
-                'LOC_Package': loc_package
-            }
-        }
+                        self.non_accessor_methods.append(m.name)
 
-        # Kumpulkan semua nama method di file untuk CM calculation
-        all_methods_in_file = [f.name for f in function_decls if not f.name.startswith(("get", "set", "is"))]
-        for c in class_decls:
+    def render(self, decl):
+        """
+        str(decl) yang di-memo. Render AST kopyt ke teks itu mahal, jadi setiap
+        node cukup di-render sekali per analisis walaupun dipakai beberapa metrik.
+        """
+        key = id(decl)
+        text = self._renders.get(key)
+        if text is None:
+            text = str(decl)
+            self._renders[key] = text
+        return text
+
+    def method_symbols(self):
+        """(nama method, class) untuk setiap nama di non_accessor_methods, urutan sama."""
+        symbols = [(f.name, "TopLevel") for f in self.function_decls if not f.name.startswith(("get", "set", "is"))]
+        for c in self.class_decls:
             if hasattr(c, 'body') and c.body and hasattr(c.body, 'members'):
                 for m in c.body.members:
                     if isinstance(m, node.FunctionDeclaration) and not m.name.startswith(("get", "set", "is")):
-                        all_methods_in_file.append(m.name)
+                        symbols.append((m.name, c.name))
+        return symbols
+
+    def imports(self):
+        """Import file ini: "a.b.C", atau "a.b.*" untuk import wildcard."""
+        headers = getattr(self.result, 'imports', None) or ()
+        return [f"{h.name}.*" if getattr(h, 'wildcard', False) else h.name for h in headers if hasattr(h, 'name')]
+
+    def package_metrics(self):
+        """Kontribusi file ini ke metrik package-level (PackageMetrics)."""
+        return PackageMetrics(len(self.non_accessor_methods), len(self.interface_decls), self.code.count("\n") + 1)
+
+
+def extracted_method(file_path, analysis=None):
+    """
+    Baris metrik per method untuk satu file sebagai list dict dengan kolom METRIC_COLUMNS
+    (bisa langsung dijadikan pd.DataFrame). Metrik package-level diisi dari file ini saja;
+    untuk agregat seluruh project pakai extract_and_parse atau build_metrics_dataframe.
+    analysis (FileAnalysis) bisa diberikan jika file sudah di-parse.
+    """
+    if analysis is None:
+        record = analyze_kotlin_file(file_path)
+        rows, package_metrics = record["rows"], record["package_metrics"]
+    else:
+        rows, package_metrics = _extract_method_rows(file_path, analysis), analysis.package_metrics()
+    package = (package_metrics or PackageMetrics()).as_dict()
+    wmc = Counter()
+    for row in rows:
+        wmc[row.owner.package, row.owner.name] += row.cc
+    datas = []
+    for row in rows:
+        values = dict(row.as_dict(), WMC_type=wmc[row.owner.package, row.owner.name],
+                      NOMNAMM_Package=package['NOMNAMM_Package'], NOI_Package=package['NOI_Package'],
+                      LOC_package=package['LOC_Package'])
+        datas.append({column: values[column] for column in METRIC_COLUMNS})
+    return datas
+
+
+def _extract_method_rows(file_path, analysis=None, profiler=None, calls=None):
+    """
+    Baris metrik per method untuk satu file, sebagai list MethodMetrics (dipakai
+    analyze_kotlin_file). Jika calls (list) diberikan, nama yang dipanggil tiap baris
+    (call-site index) ditambahkan ke list itu, urutan sama dengan baris.
+    """
+    if calls is None:
+        calls = []
+    try:
+        if analysis is None:
+            with stage(profiler, "parse", file_path):
+                analysis = FileAnalysis(file_path)
+
+        package_name = analysis.package_name
+        class_decls = analysis.class_decls
+        function_decls = analysis.function_decls
+
+        # Kumpulkan semua nama method di file untuk CM calculation
+        all_methods_in_file = MethodNameIndex(analysis.non_accessor_methods)
 
         datas = []
 
@@ -321,281 +678,1440 @@ def extracted_method(file_path):
             if not class_decl.body:
                 continue
 
-            class_name = class_decl.name
-            loc_type = count_loc_type(str(class_decl))
-            locnamm_type = count_locnamm_type(class_decl)
-            cfnamm_type = count_cfnamm_type(class_decl)
-
-            noav_class_val = count_noav_class(class_decl)
+            with stage(profiler, "class_metrics", file_path):
+                class_metrics = ClassMetrics(
+                    package_name,
+                    class_decl.name,
+                    count_loc_type(analysis.render(class_decl)),
+                    count_locnamm_type(class_decl, analysis.render),
+                    count_cfnamm_type(class_decl, analysis.render),
+                    count_noav_class(class_decl)
+                )
 
-            methods_cc = []
-            methods_info = []
+            methods = []
             for member in class_decl.body.members:
                 if isinstance(member, node.FunctionDeclaration):
                     name = member.name
-                    body = str(member.body) if member.body else ""
-
-                    cc = count_cc_manual(body)
-                    loc = body.count("\n") + 1 if body else 0
-                    max_nest = manual_max_nesting(body)
-                    mamcl = count_mamcl(body)
-                    cm = count_cm_method(body, all_methods_in_file)
-                    # Ganti pemanggilan NOAV ke noav_method
-                    noav_method_val = noav_method(class_decl, member)
-
-                    methods_cc.append(cc)
-                    methods_info.append((name, cc, loc, max_nest, mamcl, noav_method_val, cm))
-
-            woc_values = count_woc(methods_cc)
-
-            # Ambil metrik package-level dari dictionary
-            pkg_metrics = package_metrics_map.get(package_name, {'NOMNAMM_Package': 0, 'NOI_Package': 0, 'LOC_Package': 0})
-
-            for i, (name, cc, loc, nest, mamcl, noav_method_val, cm) in enumerate(methods_info):
-                woc = woc_values[i] if i < len(woc_values) else 0
-                # Method kolom: hanya nama method saja (tanpa gabungan NOAV)
-                datas.append({
-                    "Package": package_name,
-                    "Class": class_name,
-                    "Method": name,  # hanya nama method
-                    "LOC": loc,
-                    "Max Nesting": nest,
-                    "CC": cc,
-                    "WOC": woc,
-                    "MaMCL": mamcl,
-                    "NOAV": noav_method_val,  # NOAV tetap individual per baris
-                    "CM": cm,
-                    "LOC_type": loc_type,
-                    "LOCNAMM_type": locnamm_type,
-                    "CFNAMM_type": cfnamm_type,
-                    "NOMNAMM_Package": pkg_metrics['NOMNAMM_Package'],
-                    "NOI_Package": pkg_metrics['NOI_Package'],
-                    "LOC_package": pkg_metrics['LOC_Package']
-                })
+                    with stage(profiler, "method", file_path, name):
+                        with stage(profiler, "render", file_path, name):
+                            body = analysis.render(member.body) if member.body else ""
+
+                        with stage(profiler, "cc_nesting_mamcl", file_path, name):
+                            cc, max_nest, mamcl = body_metrics(member.body)
+                        loc = body.count("\n") + 1 if body else 0
+                        # Satu token stream per body, dipakai CM dan NOAV
+                        with stage(profiler, "tokenize", file_path, name):
+                            tokens = method_tokens(body)
+                        with stage(profiler, "cm", file_path, name):
+                            call_sites = tokens.call_sites()
+                            cm = count_cm_method(tokens, all_methods_in_file, call_sites)
+                        # Ganti pemanggilan NOAV ke noav_method
+                        with stage(profiler, "noav", file_path, name):
+                            noav_method_val = noav_method(class_decl, member, tokens.identifiers())
+
+                    # NOAV tetap individual per baris
+                    methods.append(MethodMetrics(class_metrics, name, loc, max_nest, cc, 0, mamcl, noav_method_val, cm))
+                    calls.append(sorted(call_sites))
+
+            # WOC baru bisa dihitung setelah CC semua method di class diketahui
+            for method, woc in zip(methods, count_woc([method.cc for method in methods])):
+                method.woc = woc
+            datas.extend(methods)
 
         # Tambahkan fungsi top-level ke dalam hasil
-        pkg_metrics = package_metrics_map.get(package_name, {'NOMNAMM_Package': 0, 'NOI_Package': 0, 'LOC_Package': 0})
+        top_level = ClassMetrics(package_name, "TopLevel")
         for func in function_decls:
-            body = str(func.body) if func.body else ""
-            cc = count_cc_manual(body)
-            loc = body.count("\n") + 1 if func.body else 0
-            max_nest = manual_max_nesting(body)
-            mamcl = count_mamcl(body)
-            # Hitung NOAV dengan fungsi baru, class_node None untuk top-level
-            noav_method_val = 0
-            cm = count_cm_method(body, all_methods_in_file)
-            
-            datas.append({
-                "Package": package_name,
-                "Class": "TopLevel",
-                "Method": func.name,
-                "LOC": loc,
-                "Max Nesting": max_nest,
-                "CC": cc,
-                "WOC": 1 if cc > 0 else 0,
-                "MaMCL": mamcl,
-                "NOAV": noav_method_val, 
-                "CM": cm,
-                "LOC_type": 0,
-                "LOCNAMM_type": 0,
-                "CFNAMM_type": 0,
-                "NOMNAMM_Package": pkg_metrics['NOMNAMM_Package'],
-                "NOI_Package": pkg_metrics['NOI_Package'],
-                "LOC_package": pkg_metrics['LOC_Package']
-            })
+            with stage(profiler, "method", file_path, func.name):
+                with stage(profiler, "render", file_path, func.name):
+                    body = analysis.render(func.body) if func.body else ""
+                with stage(profiler, "cc_nesting_mamcl", file_path, func.name):
+                    cc, max_nest, mamcl = body_metrics(func.body)
+                loc = body.count("\n") + 1 if func.body else 0
+                # Hitung NOAV dengan fungsi baru, class_node None untuk top-level
+                noav_method_val = 0
+                with stage(profiler, "tokenize", file_path, func.name):
+                    tokens = method_tokens(body)
+                with stage(profiler, "cm", file_path, func.name):
+                    call_sites = tokens.call_sites()
+                    cm = count_cm_method(tokens, all_methods_in_file, call_sites)
+            calls.append(sorted(call_sites))
+
+            datas.append(MethodMetrics(top_level, func.name, loc, max_nest, cc, 1 if cc > 0 else 0, mamcl,
+                                       noav_method_val, cm))
 
-        return datas if datas else [{
-            "Package": package_name, "Class": "None", "Method": "None",
-            "LOC": 0, "Max Nesting": 0, "CC": 0, "WOC": 0,
-            "MaMCL": 0, "NOAV": 0, "CM": 0,
-            "LOC_type": 0, "LOCNAMM_type": 0, "CFNAMM_type": 0,
-            "NOMNAMM_Package": nomnamm_package, "NOI_Package": noi_package, 
-            "LOC_package": loc_package, "Error": "No functions found"
-        }]
+        return datas if datas else [error_row("None", "No functions found", package_name, "None")]
     except Exception as e:
-        return [{
-            "Package": "Error", "Class": "Error", "Method": "Error",
-            "LOC": "Error", "Max Nesting": 0, "CC": 0, "WOC": 0,
-            "MaMCL": 0, "NOAV": 0, "CM": 0,
-            "LOC_type": 0, "LOCNAMM_type": 0, "CFNAMM_type": 0,
-            "NOMNAMM_Package": 0, "NOI_Package": 0, "LOC_package": 0, 
-            "Error": str(e)
-        }]
+        del calls[:]
+        return [error_row("Error", str(e))]
 
 
-def extract_and_parse(file):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_file_path = os.path.join(temp_dir, file.name)
+def _source_size(file_path, code):
+    if code is None:
+        return os.path.getsize(file_path)
+    if isinstance(code, bytes):
+        return len(code)
+    return len(code.encode("utf-8"))
+
+
+_PACKAGE_RE = re.compile(r'^\s*package\s+([\w.]+)', re.MULTILINE)
+_IMPORT_RE = re.compile(r'^[ \t]*import[ \t]+(\w+(?:\.\w+)*(?:\.\*)?)', re.MULTILINE)
+
+
+def lexical_record(file_path, code=None, profiler=None):
+    """
+    Analisis satu file tanpa parse kopyt (mode "lexical", untuk triage arsip besar).
+    Komentar dan string di-strip, lalu class dan fungsi dicari dari token (kurung kurawal,
+    string, dan komentar dipahami). LOC, CC, Max Nesting, MaMCL, WOC, CM, dan LOC_type
+    dihitung dari token; NOAV, LOCNAMM_type, dan CFNAMM_type bernilai 0. LOC diambil dari
+    teks sumber (mode parsed memakai teks render kopyt), jadi bisa sedikit berbeda.
+    Bentuk record sama dengan analyze_kotlin_file; setiap baris punya mode="lexical".
+    """
+    if code is None:
+        with open(file_path, "r", encoding="utf-8") as f:
+            code = f.read()
+    elif isinstance(code, bytes):
+        code = decode_source(code)
+
+    with stage(profiler, "tokenize", file_path):
+        stripped = strip_comments_and_strings(code)
+        tokens, starts = kotlin_tokens(stripped)
+        classes, functions, interfaces = scan_declarations(tokens)
+    match = _PACKAGE_RE.search(stripped)
+    package_name = match.group(1) if match else "UNKNOWN"
+
+    symbols = [[name, "TopLevel"] for name, _, _ in functions if not name.startswith(("get", "set", "is"))]
+    for class_name, _, _, methods in classes:
+        symbols.extend([name, class_name] for name, _, _ in methods if not name.startswith(("get", "set", "is")))
+    all_methods_in_file = MethodNameIndex([name for name, _ in symbols])
+
+    def span(lo, hi):
+        # Teks (sudah di-strip) dari token lo sampai token hi - 1
+        if lo is None or hi <= lo:
+            return ""
+        return stripped[starts[lo]:starts[hi - 1] + len(tokens[hi - 1])]
+
+    rows = []
+    calls = []
+
+    def method_row(owner, name, lo, hi):
+        with stage(profiler, "method", file_path, name):
+            body = span(lo, hi)
+            cc, max_nest, mamcl = lexical_body_metrics(tokens, lo, hi) if body else (1, 0, 0)
+            # Token body diambil dari token file, tidak perlu tokenisasi ulang
+            stream = TokenStream(body, tokens[lo:hi] if body else [])
+            call_sites = stream.call_sites()
+            cm = count_cm_method(stream, all_methods_in_file, call_sites)
+        calls.append(sorted(call_sites))
+        return MethodMetrics(owner, name, body.count("\n") + 1 if body else 0, max_nest, cc, 0, mamcl, 0, cm,
+                             mode="lexical")
+
+    with stage(profiler, "methods", file_path):
+        for class_name, start, end, members in classes:
+            owner = ClassMetrics(package_name, class_name, count_loc_type(span(start, end)))
+            methods = [method_row(owner, name, lo, hi) for name, lo, hi in members]
+            for method, woc in zip(methods, count_woc([method.cc for method in methods])):
+                method.woc = woc
+            rows.extend(methods)
+        top_level = ClassMetrics(package_name, "TopLevel")
+        for name, lo, hi in functions:
+            row = method_row(top_level, name, lo, hi)
+            row.woc = 1 if row.cc > 0 else 0
+            rows.append(row)
+
+    if not rows:
+        rows = [error_row("None", "No functions found", package_name, "None").replace(mode="lexical")]
+    return {
+        "path": file_path,
+        "package": package_name,
+        "rows": rows,
+        "package_metrics": PackageMetrics(len(symbols), interfaces, code.count("\n") + 1),
+        "symbols": symbols,
+        "calls": calls,
+        "imports": _IMPORT_RE.findall(stripped)
+    }
+
+
+def limit_record(file_path, code, reason, on_limit="error"):
+    """
+    Record untuk file yang melewati batas ukuran atau waktu parse.
+    on_limit="error": satu baris Error berisi alasannya.
+    on_limit="lexical": file dianalisis dengan lexical_record (tanpa parse kopyt); baris
+    hasilnya ditandai kolom Mode "lexical" dan alasannya tetap ada di key limit record.
+    """
+    if on_limit == "lexical":
+        try:
+            if code is None:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    code = f.read()
+            elif isinstance(code, bytes):
+                code = decode_source(code)
+        except (OSError, UnicodeError) as e:
+            reason = f"{reason}; {e}"
+        else:
+            return dict(lexical_record(file_path, code), limit=reason)
+    return {
+        "path": file_path,
+        "package": None,
+        "rows": [error_row(file_path, reason)],
+        "package_metrics": None,
+        "symbols": [],
+        "calls": [],
+        "limit": reason
+    }
+
+
+def analyze_kotlin_file(file_path, code=None, profile=False, max_file_bytes=None, on_limit="error", mode="parsed"):
+    """
+    Analisis satu file Kotlin dan kembalikan record per file yang bisa di-pickle.
+    Dipakai oleh mode serial maupun worker ProcessPoolExecutor, jadi hasil
+    kedua mode selalu sama. Untuk cache/JSON, pakai encode_record dan decode_record.
+
+    Record berisi:
+    - path: path file
+    - package: nama package, atau None jika file gagal di-parse
+    - rows: baris metrik per method (list MethodMetrics)
+    - package_metrics: PackageMetrics, kontribusi file ke NOMNAMM_Package, NOI_Package, LOC_Package
+    - symbols: [nama method, class] yang dideklarasikan file (untuk SymbolIndex)
+    - calls: nama yang dipanggil tiap baris (urutan sama dengan rows)
+    - imports: import file ("a.b.C" atau "a.b.*"), untuk CM lingkup project
+    - profile: event Profiler untuk file ini (hanya jika profile=True)
+    - limit: alasan jika file melewati batas (lihat limit_record), record seperti ini tidak di-cache
+
+    File yang lebih besar dari max_file_bytes tidak di-parse (lihat limit_record untuk on_limit).
+    mode="lexical" memakai lexical_record (tanpa parse kopyt) untuk semua file.
+    """
+    if max_file_bytes is not None:
         try:
-            # Tulis file ke temporary directory
-            with open(temp_file_path, "wb") as f:
-                f.write(file.getbuffer())
-
-            # Ekstrak arsip
-            patoolib.extract_archive(temp_file_path, outdir=temp_dir)
-            
-            # Cari semua file Kotlin
-            kotlin_files = [
-                os.path.join(root, f)
-                for root, _, files in os.walk(temp_dir)
-                for f in files if f.endswith(".kt") or f.endswith(".kts")
-            ]
-
-            if not kotlin_files:
-                return pd.DataFrame([{
-                    "Package": "Error",
-                    "Class": "Error",
-                    "Method": "Error",
-                    "LOC": "Error",
-                    "Max Nesting": 0,
-                    "CC": 0,
-                    "WOC": 0,
-                    "MaMCL": 0,
-                    "NOAV": 0,
-                    "CM": 0,
-                    "LOC_type": 0,
-                    "LOCNAMM_type": 0,
-                    "CFNAMM_type": 0,
-                    "NOMNAMM_Package": 0,
-                    "NOI_Package": 0,
-                    "LOC_package": 0,
-                    "Error": "No Kotlin files found in archive"
-                }])
-
-            results = []
-            file_package_map = {}  # file_path -> package_name
-            file_code_map = {}     # file_path -> code string
-
-            # Pass 1: Kumpulkan hasil per file dan mapping file ke package
-            for kotlin_file in kotlin_files:
+            size = _source_size(file_path, code)
+        except OSError:
+            size = 0  # Biarkan FileAnalysis yang melaporkan error baca file
+        if size > max_file_bytes:
+            return limit_record(file_path, code, f"File too large ({size} bytes > {max_file_bytes})", on_limit)
+
+    profiler = Profiler() if profile else None
+    if mode == "lexical":
+        try:
+            record = lexical_record(file_path, code, profiler)
+        except (OSError, UnicodeError) as file_error:
+            record = {
+                "path": file_path,
+                "package": None,
+                "rows": [error_row(file_path, str(file_error)).replace(mode="lexical")],
+                "package_metrics": None,
+                "symbols": [],
+                "calls": []
+            }
+        if profiler is not None:
+            record["profile"] = profiler.events
+        return record
+
+    try:
+        with stage(profiler, "parse", file_path):
+            analysis = FileAnalysis(file_path, code)
+    except Exception as file_error:
+        record = {
+            "path": file_path,
+            "package": None,
+            "rows": [error_row(file_path, str(file_error))],
+            "package_metrics": None,
+            "symbols": [],
+            "calls": []
+        }
+    else:
+        calls = []
+        with stage(profiler, "methods", file_path):
+            rows = _extract_method_rows(file_path, analysis, profiler, calls)
+        record = {
+            "path": file_path,
+            "package": analysis.package_name,
+            "rows": rows,
+            "package_metrics": analysis.package_metrics(),
+            "symbols": [list(symbol) for symbol in analysis.method_symbols()],
+            "calls": calls,
+            "imports": analysis.imports()
+        }
+    if profiler is not None:
+        record["profile"] = profiler.events
+    return record
+
+
+def content_key(code, mode="parsed"):
+    """Key cache untuk satu file: versi analyzer (+ mode jika bukan "parsed") + hash SHA-256 dari isi file."""
+    digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+    if mode != "parsed":
+        return f"{ANALYZER_VERSION}:{mode}:{digest}"
+    return f"{ANALYZER_VERSION}:{digest}"
+
+
+def _restore_cached_record(cached, file_path):
+    # Record di cache tidak terikat path: pasang path file saat ini
+    record = dict(cached, path=file_path)
+    if record["package"] is None:
+        record["rows"] = [row.replace(name=file_path) for row in record["rows"]]
+    return record
+
+
+class AnalysisCancelled(Exception):
+    """Analisis dihentikan karena cancel (threading.Event) di-set oleh pemanggil."""
+
+
+def _guarded_worker(conn):
+    # Worker untuk _map_analyze_with_timeout: satu file per pesan, berhenti saat menerima None
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(analyze_kotlin_file(*task))
+
+
+class AnalysisPool:
+    """
+    Worker process yang dipakai ulang oleh beberapa panggilan analyze_kotlin_sources
+    (misalnya setiap batch di extract_to_file), supaya process tidak dibuat dan dimatikan
+    per panggilan. Tanpa parse_timeout dipakai satu ProcessPoolExecutor; dengan
+    parse_timeout disimpan worker yang bisa di-kill (lihat _map_analyze_with_timeout).
+    Process baru dibuat saat pertama kali dibutuhkan. Pakai sebagai context manager.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._executor = None
+        self._idle = []  # (conn, process) worker _guarded_worker yang sedang menganggur
+
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def take_worker(self):
+        if self._idle:
+            return self._idle.pop()
+        import multiprocessing
+        context = multiprocessing.get_context()
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_guarded_worker, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return parent_conn, process
+
+    def release_worker(self, worker):
+        self._idle.append(worker)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        for conn, process in self._idle:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for conn, process in self._idle:
+            process.join()
+            conn.close()
+        self._idle = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _map_analyze_with_timeout(kotlin_files, codes, workers, parse_timeout, profile=False, max_file_bytes=None,
+                              on_limit="error", mode="parsed", pool=None):
+    """
+    Seperti _map_analyze, tapi setiap file dianalisis di worker process milik sendiri yang
+    bisa dimatikan. File yang melewati parse_timeout detik dihentikan (worker di-kill lalu
+    diganti baru) dan diganti dengan limit_record; file lain tetap berjalan.
+    Worker diambil dari pool (AnalysisPool) dan dikembalikan setelah selesai; tanpa pool
+    worker dibuat untuk panggilan ini saja.
+    """
+    from multiprocessing.connection import wait
+
+    own_pool = pool is None
+    if own_pool:
+        pool = AnalysisPool(workers)
+    n = len(kotlin_files)
+    spawn = pool.take_worker
+
+    tasks = enumerate(zip(kotlin_files, codes))
+    idle = [spawn() for _ in range(max(1, min(workers, n)))] if n else []
+    busy = {}  # conn -> (process, index, path, code, deadline)
+    results = {}
+    next_index = 0
+    try:
+        while next_index < n:
+            while idle:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                i, (kotlin_file, code) = task
+                conn, process = idle.pop()
+                conn.send((kotlin_file, code, profile, max_file_bytes, on_limit, mode))
+                busy[conn] = (process, i, kotlin_file, code, time.monotonic() + parse_timeout)
+
+            # Record dihasilkan sesuai urutan input
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
+            if not busy:
+                continue
+
+            timeout = max(0.0, min(entry[4] for entry in busy.values()) - time.monotonic())
+            for conn in wait(list(busy), timeout):
+                process, i, kotlin_file, code, _ = busy.pop(conn)
                 try:
+                    results[i] = conn.recv()
+                except EOFError:
+                    # Worker mati di tengah jalan (misalnya kehabisan memori)
+                    process.join()
+                    conn.close()
+                    results[i] = limit_record(kotlin_file, code, f"Worker exited with code {process.exitcode}")
+                    idle.append(spawn())
+                else:
+                    idle.append((conn, process))
+
+            now = time.monotonic()
+            for conn, (process, i, kotlin_file, code, deadline) in list(busy.items()):
+                if deadline <= now:
+                    process.kill()
+                    process.join()
+                    conn.close()
+                    del busy[conn]
+                    results[i] = limit_record(kotlin_file, code, f"Parse timeout after {parse_timeout}s", on_limit)
+                    idle.append(spawn())
+    finally:
+        # Worker yang masih mengerjakan file (misalnya dibatalkan) tidak bisa dipakai ulang
+        for conn, (process, *_) in busy.items():
+            process.kill()
+            process.join()
+            conn.close()
+        for worker in idle:
+            pool.release_worker(worker)
+        if own_pool:
+            pool.close()
+
+
+def _map_analyze(kotlin_files, codes, workers, chunksize, profile=False, max_file_bytes=None, parse_timeout=None,
+                 on_limit="error", mode="parsed", pool=None):
+    # Generator: record dihasilkan satu per satu sesuai urutan input
+    if pool is not None:
+        workers = pool.workers
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if parse_timeout is not None:
+        # Timeout hanya bisa ditegakkan di worker process yang bisa di-kill, juga untuk workers=1
+        yield from _map_analyze_with_timeout(kotlin_files, codes, workers, parse_timeout, profile, max_file_bytes,
+                                             on_limit, mode, pool)
+        return
+    if workers <= 1 or len(kotlin_files) <= 1:
+        for kotlin_file, code in zip(kotlin_files, codes):
+            yield analyze_kotlin_file(kotlin_file, code, profile, max_file_bytes, on_limit, mode)
+        return
+
+    if chunksize is None:
+        # Beberapa chunk per worker supaya beban tetap seimbang
+        chunksize = max(1, len(kotlin_files) // (workers * 4))
+    n = len(kotlin_files)
+    if pool is not None:
+        # Executor milik pool tetap hidup; jika berhenti di tengah, executor.map membatalkan sisa task
+        yield from pool.executor().map(analyze_kotlin_file, kotlin_files, codes, [profile] * n,
+                                       [max_file_bytes] * n, [on_limit] * n, [mode] * n, chunksize=chunksize)
+        return
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield from executor.map(analyze_kotlin_file, kotlin_files, codes, [profile] * n, [max_file_bytes] * n,
+                                [on_limit] * n, [mode] * n, chunksize=chunksize)
+    finally:
+        # Jika berhenti di tengah (misalnya dibatalkan), file yang belum mulai tidak dikerjakan
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise AnalysisCancelled()
+
+
+def _track_records(records, progress=None, cancel=None):
+    # Cek cancel sebelum tiap file dan laporkan setiap record yang selesai ke progress
+    records = iter(records)
+    while True:
+        _check_cancel(cancel)
+        record = next(records, None)
+        if record is None:
+            return
+        if progress is not None:
+            progress(record)
+        yield record
+
+
+def _collect_profile(records, profiler):
+    # Event profiling dibuat di tiap file (bisa di worker process), lalu digabung di sini
+    for record in records:
+        events = record.pop("profile", None)
+        if events and profiler is not None:
+            profiler.extend(events)
+    return records
+
+
+def _fan_out_record(record, file_path):
+    # Record file lain dengan isi identik, dipasang ke path ini
+    rows = [row.replace(name=file_path) if row.name == record["path"] else row for row in record["rows"]]
+    return dict(record, path=file_path, rows=rows, duplicate_of=record["path"])
+
+
+def _dedup_analyze(sources, cancel, analyze, progress=None):
+    # Kelompokkan sources berdasarkan hash isi file, analisis satu file per isi, lalu sebar hasilnya.
+    # analyze(unique_sources, progress); progress juga dipanggil untuk setiap salinan.
+    unique_sources = []
+    owners = []  # (path, index di unique_sources) sesuai urutan sources
+    seen = {}
+    for kotlin_file, code in sources:
+        _check_cancel(cancel)
+        data = code
+        if data is None:
+            try:
+                with open(kotlin_file, "rb") as f:
+                    data = f.read()
+            except OSError:
+                # Biarkan analisis yang membuat baris Error-nya
+                owners.append((kotlin_file, len(unique_sources)))
+                unique_sources.append((kotlin_file, None))
+                continue
+        digest = hashlib.sha256(data.encode("utf-8") if isinstance(data, str) else data).digest()
+        index = seen.get(digest)
+        if index is None:
+            index = seen[digest] = len(unique_sources)
+            unique_sources.append((kotlin_file, data))
+        owners.append((kotlin_file, index))
+
+    copies = {}  # index di unique_sources -> path salinan dengan isi yang sama
+    for kotlin_file, index in owners:
+        if unique_sources[index][0] != kotlin_file:
+            copies.setdefault(index, []).append(kotlin_file)
+    unique_progress = progress
+    if progress is not None and copies:
+        positions = {kotlin_file: index for index, (kotlin_file, _) in enumerate(unique_sources)}
+
+        def unique_progress(record):
+            # Salinan dilaporkan begitu file aslinya selesai, supaya jumlah file selesai tetap akurat
+            progress(record)
+            for kotlin_file in copies.get(positions.get(record["path"]), ()):
+                progress(_fan_out_record(record, kotlin_file))
+
+    records = analyze(unique_sources, unique_progress)
+    return [records[index] if records[index]["path"] == kotlin_file else _fan_out_record(records[index], kotlin_file)
+            for kotlin_file, index in owners]
+
+
+def analyze_kotlin_sources(sources, workers=1, chunksize=None, cache=None, profiler=None, progress=None,
+                           cancel=None, max_file_bytes=None, parse_timeout=None, on_limit="error", dedup=False,
+                           mode="parsed", pool=None):
+    """
+    Analisis file Kotlin dari iterable (path, code), serial (workers=1) atau paralel
+    dengan ProcessPoolExecutor. workers=None memakai semua CPU. code boleh str, bytes
+    (misalnya langsung dari arsip), atau None untuk dibaca dari path.
+    Urutan record selalu mengikuti urutan sources.
+
+    Jika cache (MetricCache) diberikan, file yang isinya sudah pernah dianalisis
+    diambil dari cache; hanya file yang berubah yang di-parse.
+    Jika profiler (Profiler) diberikan, waktu per tahap, per file, dan per method dicatat.
+    progress(record) dipanggil setiap satu file selesai; jika cancel (threading.Event)
+    di-set, analisis berhenti sebelum file berikutnya dengan AnalysisCancelled.
+
+    Batas per file: file lebih besar dari max_file_bytes tidak di-parse, dan parse yang
+    lebih lama dari parse_timeout detik dihentikan (worker process-nya di-kill).
+    on_limit="error" menghasilkan baris Error, on_limit="lexical" metrik teks murah
+    (lihat limit_record).
+
+    Dengan dedup=True, file yang isinya identik (hash konten sama) hanya dianalisis sekali
+    dan hasilnya dipasang ke setiap path; record salinan punya key duplicate_of dan
+    progress tetap dipanggil untuk setiap path.
+
+    mode="lexical" melewati parse kopyt dan memakai lexical_record (triage cepat); kolom
+    Mode di DataFrame menunjukkan mode yang menghasilkan setiap baris.
+
+    pool (AnalysisPool) dipakai untuk worker process jika diberikan (workers diambil dari
+    pool), supaya panggilan berulang tidak membuat process baru setiap kali.
+    """
+    if dedup:
+        return _dedup_analyze(sources, cancel, lambda unique_sources, unique_progress: analyze_kotlin_sources(
+            unique_sources, workers, chunksize, cache, profiler, unique_progress, cancel, max_file_bytes,
+            parse_timeout, on_limit, mode=mode, pool=pool), progress)
+
+    profile = profiler is not None
+    limits = {"max_file_bytes": max_file_bytes, "parse_timeout": parse_timeout, "on_limit": on_limit, "mode": mode,
+              "pool": pool}
+    if pool is not None:
+        workers = pool.workers
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if cache is None:
+        if workers <= 1 and parse_timeout is None:
+            # Serial: sources dibaca satu per satu, tidak perlu ditampung semua di memori
+            records = (analyze_kotlin_file(kotlin_file, code, profile, max_file_bytes, on_limit, mode)
+                       for kotlin_file, code in sources)
+        else:
+            sources = list(sources)
+            records = _map_analyze([kotlin_file for kotlin_file, _ in sources], [code for _, code in sources],
+                                   workers, chunksize, profile, **limits)
+        return _collect_profile(list(_track_records(records, progress, cancel)), profiler)
+
+    # Semua get/put satu kali analisis ditulis dalam satu transaksi cache, bukan commit per file
+    batch = cache.batch() if hasattr(cache, "batch") else contextlib.nullcontext()
+    with batch:
+        records = []
+        pending = []  # (index, path, code, key) untuk file yang belum ada di cache
+        for i, (kotlin_file, code) in enumerate(sources):
+            _check_cancel(cancel)
+            records.append(None)
+            try:
+                if code is None:
                     with open(kotlin_file, "r", encoding="utf-8") as f:
                         code = f.read()
-                    parser = Parser(code)
-                    result = parser.parse()
-                    if hasattr(result, 'package') and result.package:
-                        package_name = result.package.name if hasattr(result.package, 'name') else str(result.package)
-                    else:
-                        package_name = "UNKNOWN"
-                    file_package_map[kotlin_file] = package_name
-                    file_code_map[kotlin_file] = code
-                    file_result = extracted_method(kotlin_file)
-                    if file_result:
-                        results.extend(file_result)
-                except Exception as file_error:
-                    results.append({
-                        "Package": "Error",
-                        "Class": "Error",
-                        "Method": kotlin_file,
-                        "LOC": "Error",
-                        "Max Nesting": 0,
-                        "CC": 0,
-                        "WOC": 0,
-                        "MaMCL": 0,
-                        "NOAV": 0,
-                        "CM": 0,
-                        "LOC_type": 0,
-                        "LOCNAMM_type": 0,
-                        "CFNAMM_type": 0,
-                        "NOMNAMM_Package": 0,
-                        "NOI_Package": 0,
-                        "LOC_package": 0,
-                        "Error": str(file_error)
-                    })
-
-            # Pass 2: Hitung ulang metrik package-level secara agregat
-            # Kumpulkan semua file per package
-            package_files = {}
-            for file_path, pkg in file_package_map.items():
-                package_files.setdefault(pkg, []).append(file_path)
-
-            # Hitung metrik package-level agregat
-            package_metrics_map = {}
-            for pkg, files in package_files.items():
-                all_code = ""
-                all_functions = 0
-                all_interfaces = 0
-                for file_path in files:
-                    code = file_code_map[file_path]
-                    all_code += code + "\n"
-                    parser = Parser(code)
-                    result = parser.parse()
-                    declarations = result.declarations if hasattr(result, 'declarations') else []
-                    class_decls = [n for n in declarations if isinstance(n, node.ClassDeclaration)]
-                    interface_decls = [n for n in declarations if isinstance(n, node.InterfaceDeclaration)]
-                    function_decls = [n for n in declarations if isinstance(n, node.FunctionDeclaration)]
-                    all_functions += sum(1 for f in function_decls if not f.name.startswith(("get", "set", "is")))
-                    for c in class_decls:
-                        if hasattr(c, 'body') and c.body and hasattr(c.body, 'members'):
-                            for m in c.body.members:
-                                if isinstance(m, node.FunctionDeclaration) and not m.name.startswith(("get", "set", "is")):
-                                    all_functions += 1
-                    all_interfaces += len(interface_decls)
-                loc_package = all_code.count("\n") + 1
-                package_metrics_map[pkg] = {
-                    'NOMNAMM_Package': all_functions,
-                    'NOI_Package': all_interfaces,
-                    'LOC_Package': loc_package
-                }
-
-            # Update semua baris di results dengan metrik package-level agregat
-            for row in results:
-                pkg = row.get("Package", "UNKNOWN")
-                pkg_metrics = package_metrics_map.get(pkg, {'NOMNAMM_Package': 0, 'NOI_Package': 0, 'LOC_Package': 0})
-                row["NOMNAMM_Package"] = pkg_metrics['NOMNAMM_Package']
-                row["NOI_Package"] = pkg_metrics['NOI_Package']
-                row["LOC_package"] = pkg_metrics['LOC_Package']
-
-            df = pd.DataFrame(results)
-
-            # --- PATCH: Update NOAV agar semua method dengan nama sama dapat total NOAV seluruh project ---
-            # HAPUS/COMMENT PATCH INI AGAR NOAV TIDAK DIJUMLAHKAN
-            # noav_sum_by_method = df.groupby("Method")["NOAV"].sum().to_dict()
-            # df["NOAV"] = df["Method"].map(noav_sum_by_method)
-            # --- END PATCH ---
-
-            # Tambahkan baris total
-            numeric_columns = ['LOC', 'Max Nesting', 'CC', 'WOC', 'MaMCL', 'NOAV', 'CM', 
-                                'LOC_type', 'LOCNAMM_type', 'CFNAMM_type', 'NOMNAMM_Package', 
-                                'NOI_Package', 'LOC_package']
-            
-            # Konversi kolom 'LOC' ke numerik, ganti 'Error' dengan 0
-            df['LOC'] = pd.to_numeric(df['LOC'].replace('Error', 0))
-            
-            # Hitung total
-            totals = df[numeric_columns].sum()
-            
-            # Buat baris total
-            total_row = pd.DataFrame([{
-                'Package': 'TOTAL',
-                'Class': '',
-                'Method': '',
-                **totals,
-                'Error': ''
-            }])
-            
-            # Gabungkan DataFrame asli dengan baris total
-            df = pd.concat([df, total_row], ignore_index=True)
-            
-            return df
-
-        except Exception as e:
-            return pd.DataFrame([{
-                "Package": "Error",
-                "Class": "Error",
-                "Method": "Error",
-                "LOC": "Error",
-                "Max Nesting": 0,
-                "CC": 0,
-                "WOC": 0,
-                "MaMCL": 0,
-                "NOAV": 0,
-                "CM": 0,
-                "LOC_type": 0,
-                "LOCNAMM_type": 0,
-                "CFNAMM_type": 0,
-                "NOMNAMM_Package": 0,
-                "NOI_Package": 0,
-                "LOC_package": 0,
-                "Error": f"Archive extraction error: {str(e)}"
-            }])
\ No newline at end of file
+                elif isinstance(code, bytes):
+                    code = decode_source(code)
+            except (OSError, UnicodeError):
+                # Biarkan analyze_kotlin_file yang membuat baris Error-nya
+                pending.append((i, kotlin_file, code, None))
+                continue
+            if max_file_bytes is not None and _source_size(kotlin_file, code) > max_file_bytes:
+                # Hasil analisis penuh di cache tidak dipakai untuk file di atas batas
+                pending.append((i, kotlin_file, code, None))
+                continue
+            key = content_key(code, mode)
+            cached = cache.get(key)
+            if cached is not None:
+                records[i] = _restore_cached_record(decode_record(cached), kotlin_file)
+                if progress is not None:
+                    progress(records[i])
+            else:
+                pending.append((i, kotlin_file, code, key))
+
+        fresh_records = _map_analyze(
+            [kotlin_file for _, kotlin_file, _, _ in pending],
+            [code for _, _, code, _ in pending],
+            workers, chunksize, profile, **limits
+        )
+        fresh_records = _collect_profile(list(_track_records(fresh_records, progress, cancel)), profiler)
+        for (i, _, _, key), record in zip(pending, fresh_records):
+            records[i] = record
+            if key is not None and "limit" not in record:
+                cache.put(key, encode_record({k: v for k, v in record.items() if k != "path"}))
+        return records
+
+
+def analyze_kotlin_files(kotlin_files, workers=1, chunksize=None, cache=None, profiler=None):
+    """Sama seperti analyze_kotlin_sources, untuk daftar path file Kotlin di disk."""
+    return analyze_kotlin_sources(((kotlin_file, None) for kotlin_file in kotlin_files), workers, chunksize, cache,
+                                  profiler)
+
+
+_PACKAGE_METRICS = ('NOMNAMM_Package', 'NOI_Package', 'LOC_Package')
+
+
+def aggregate_package_metrics(records):
+    """
+    Hitung metrik package-level agregat dari kontribusi tiap file.
+    Counter per file dikumpulkan ke satu array int64, lalu dijumlahkan per package
+    dengan groupby (tanpa menggabungkan source maupun parse ulang).
+    """
+    packages = []
+    counts = array("q")
+    for record in records:
+        if record["package"] is None:
+            continue
+        packages.append(record["package"])
+        counts.extend(record["package_metrics"].to_list())
+    if not packages:
+        return {}
+
+    per_file = pd.DataFrame(np.frombuffer(counts, dtype=np.int64).reshape(-1, len(_PACKAGE_METRICS)),
+                            columns=_PACKAGE_METRICS, copy=False)
+    totals = per_file.groupby(np.array(packages, dtype=object), sort=False).sum()
+    # Sama dengan menghitung newline dari gabungan semua kode (code + "\n") di package
+    totals['LOC_Package'] += 1
+    return totals.to_dict("index")
+
+
+class SymbolIndex:
+    """
+    Tabel simbol project: nama method -> list (package, class, path) yang mendeklarasikannya.
+    Dibangun sekali dari record per file, lalu CM lintas file dihitung dengan lookup
+    hash per nama yang dipanggil (bukan membandingkan setiap file dengan semua file lain).
+    """
+
+    def __init__(self, records=()):
+        self.declarations = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        package = record["package"]
+        for name, class_name in record.get("symbols") or ():
+            self.declarations.setdefault(name, []).append((package, class_name, record["path"]))
+
+    def remove(self, record):
+        path = record["path"]
+        for name, _ in record.get("symbols") or ():
+            entries = self.declarations.get(name)
+            if entries is None:
+                continue
+            entries[:] = [entry for entry in entries if entry[2] != path]
+            if not entries:
+                del self.declarations[name]
+
+    def lookup(self, name):
+        """List (package, class, path) yang mendeklarasikan method name."""
+        return self.declarations.get(name, [])
+
+    def count(self, name, package=None, imports=(), path=None):
+        """
+        Jumlah class (bukan deklarasi) di file lain yang mendeklarasikan method name dan
+        terlihat dari file pemanggil: package yang sama dengan package, atau di-import
+        lewat imports ("a.b.C", "a.b.*", atau "a.b.fungsi" untuk fungsi top-level).
+        Deklarasi di file path sendiri tidak dihitung.
+        """
+        classes = set()
+        for entry_package, class_name, entry_path in self.declarations.get(name, ()):
+            if entry_path == path or (entry_package, class_name) in classes:
+                continue
+            if (entry_package == package or f"{entry_package}.*" in imports
+                    or f"{entry_package}.{name if class_name == 'TopLevel' else class_name}" in imports):
+                classes.add((entry_package, class_name))
+        return len(classes)
+
+
+def project_cm_rows(record, symbols):
+    """
+    Baris record dengan CM lingkup project: CM per file ditambah jumlah class di file lain
+    yang mendeklarasikan method yang dipanggil (dihitung per kemunculan, sama seperti CM
+    per file). Hanya class di package yang sama atau yang di-import yang dihitung, dan
+    nama yang juga dideklarasikan di file sendiri (override, misalnya super.onCreate())
+    dianggap sudah dihitung oleh CM per file.
+    """
+    calls = record.get("calls") or []
+    own = {name for name, _ in record.get("symbols") or ()}
+    package = record["package"]
+    imports = frozenset(record.get("imports") or ())
+    path = record["path"]
+    rows = []
+    for i, row in enumerate(record["rows"]):
+        if i < len(calls) and calls[i]:
+            external = sum(symbols.count(name, package, imports, path) for name in calls[i] if name not in own)
+            if external:
+                row = row.replace(cm=row.cm + external)
+        rows.append(row)
+    return rows
+
+
+def apply_project_cm(records, symbols=None):
+    """Return record baru dengan CM lingkup project (lihat project_cm_rows)."""
+    records = list(records)
+    if symbols is None:
+        symbols = SymbolIndex(records)
+    return [dict(record, rows=project_cm_rows(record, symbols)) for record in records]
+
+
+# Kolom metrik per baris yang disimpan ColumnarResults (metrik package diisi saat build)
+_INT_COLUMNS = ("LOC", "Max Nesting", "CC", "MaMCL", "NOAV", "CM", "LOC_type", "LOCNAMM_type", "WMC_type")
+_FLOAT_COLUMNS = ("WOC", "CFNAMM_type")
+# (kolom DataFrame, key di package_metrics_map) untuk metrik package-level
+PACKAGE_COLUMNS = (("NOMNAMM_Package", "NOMNAMM_Package"), ("NOI_Package", "NOI_Package"),
+                   ("LOC_package", "LOC_Package"))
+# Kolom per baris tanpa metrik package-level
+ROW_COLUMNS = [column for column in METRIC_COLUMNS if column not in dict(PACKAGE_COLUMNS)]
+
+
+class ColumnarResults:
+    """
+    Penampung hasil per kolom (append-only) sebagai pengganti list of dict.
+    Metrik numerik disimpan di array bertipe, Package/Class sebagai kode kategori,
+    lalu DataFrame dibangun dari buffer array tersebut tanpa menyalin per baris.
+    Metrik package-level diisi dengan lookup vektor berdasarkan kode Package.
+    """
+
+    def __init__(self):
+        self._categories = {"Package": {}, "Class": {}, "Mode": {}}
+        self._codes = {"Package": array("q"), "Class": array("q"), "Mode": array("q")}
+        self._ints = {column: array("q") for column in _INT_COLUMNS}
+        self._floats = {column: array("d") for column in _FLOAT_COLUMNS}
+        self.methods = []
+        self.errors = []
+
+    def __len__(self):
+        return len(self.methods)
+
+    def _code(self, column, value):
+        categories = self._categories[column]
+        code = categories.get(value)
+        if code is None:
+            code = categories[value] = len(categories)
+        return code
+
+    def append(self, row, wmc_type=0):
+        """Tambahkan satu MethodMetrics; wmc_type adalah jumlah CC class pemilik di file yang sama."""
+        owner = row.owner
+        self._codes["Package"].append(self._code("Package", owner.package))
+        self._codes["Class"].append(self._code("Class", owner.name))
+        ints = self._ints
+        ints["LOC"].append(row.loc)
+        ints["Max Nesting"].append(row.max_nesting)
+        ints["CC"].append(row.cc)
+        ints["MaMCL"].append(row.mamcl)
+        ints["NOAV"].append(row.noav)
+        ints["CM"].append(row.cm)
+        ints["LOC_type"].append(owner.loc_type)
+        ints["LOCNAMM_type"].append(owner.locnamm_type)
+        ints["WMC_type"].append(wmc_type)
+        self._floats["WOC"].append(row.woc)
+        self._floats["CFNAMM_type"].append(owner.cfnamm_type)
+        self.methods.append(row.name)
+        self.errors.append(np.nan if row.error is None else row.error)
+        self._codes["Mode"].append(self._code("Mode", row.mode))
+
+    def extend(self, rows):
+        """
+        Tambahkan semua baris satu file. WMC_type (jumlah CC per class) dihitung per file,
+        jadi class dengan nama sama di file lain (flavor, salinan di build/) tidak ikut dijumlahkan.
+        """
+        rows = list(rows)
+        wmc = Counter()
+        for row in rows:
+            wmc[row.owner.package, row.owner.name] += row.cc
+        for row in rows:
+            self.append(row, wmc[row.owner.package, row.owner.name])
+
+    def to_dataframe(self, package_metrics_map):
+        """
+        Bangun DataFrame dari buffer kolom. Jika package_metrics_map None, kolom
+        metrik package-level tidak diikutkan (dipakai saat output streaming, karena
+        total package baru diketahui setelah semua file selesai).
+        """
+        package_codes = np.frombuffer(self._codes["Package"], dtype=np.int64)
+        data = {}
+        for column in ("Package", "Class", "Mode"):
+            codes = np.frombuffer(self._codes[column], dtype=np.int64)
+            data[column] = pd.Categorical.from_codes(codes, categories=list(self._categories[column]))
+        data["Method"] = self.methods
+        for column, values in self._ints.items():
+            data[column] = np.frombuffer(values, dtype=np.int64)
+        for column, values in self._floats.items():
+            data[column] = np.frombuffer(values, dtype=np.float64)
+
+        data["Error"] = self.errors
+        if package_metrics_map is None:
+            return pd.DataFrame(data, columns=ROW_COLUMNS, copy=False)
+
+        # Join vektor: metrik tiap package dicari sekali per kategori lalu di-index dengan kode baris
+        packages = list(self._categories["Package"])
+        for column, metric in PACKAGE_COLUMNS:
+            per_package = np.array([package_metrics_map.get(pkg, {}).get(metric, 0) for pkg in packages], dtype=np.int64)
+            data[column] = per_package[package_codes]
+        return pd.DataFrame(data, columns=METRIC_COLUMNS, copy=False)
+
+
+def build_metrics_dataframe(records, package_metrics_map=None):
+    """
+    Gabungkan record per file menjadi satu DataFrame: hitung metrik package-level
+    agregat (kecuali sudah diberikan), isi ke semua baris, lalu tambahkan baris TOTAL.
+    """
+    records = list(records)
+    results = ColumnarResults()
+    for record in records:
+        results.extend(record["rows"])
+
+    if package_metrics_map is None:
+        package_metrics_map = aggregate_package_metrics(records)
+
+    # Metrik package-level agregat diisi ke semua baris saat DataFrame dibangun
+    df = results.to_dataframe(package_metrics_map)
+
+    # --- PATCH: Update NOAV agar semua method dengan nama sama dapat total NOAV seluruh project ---
+    # HAPUS/COMMENT PATCH INI AGAR NOAV TIDAK DIJUMLAHKAN
+    # noav_sum_by_method = df.groupby("Method")["NOAV"].sum().to_dict()
+    # df["NOAV"] = df["Method"].map(noav_sum_by_method)
+    # --- END PATCH ---
+
+    # Tambahkan baris total
+    numeric_columns = ['LOC', 'Max Nesting', 'CC', 'WOC', 'MaMCL', 'NOAV', 'CM', 
+                        'LOC_type', 'LOCNAMM_type', 'CFNAMM_type', 'WMC_type', 'NOMNAMM_Package', 
+                        'NOI_Package', 'LOC_package']
+    
+    # Hitung total
+    totals = df[numeric_columns].sum()
+    
+    # Buat baris total
+    total_row = pd.DataFrame([{
+        'Package': 'TOTAL',
+        'Class': '',
+        'Method': '',
+        **totals,
+        'Error': '',
+        'Mode': ''
+    }])
+    
+    # Gabungkan DataFrame asli dengan baris total
+    return pd.concat([df, total_row], ignore_index=True)
+
+
+class ProjectIndex:
+    """
+    Index record per file untuk satu project (key: path relatif), beserta total
+    kontribusi per package. Saat file berubah, record lamanya dikurangkan dan record
+    barunya ditambahkan, jadi hanya package yang terpengaruh yang berubah dan
+    tidak ada file lain yang perlu di-parse ulang.
+    """
+
+    def __init__(self, revision=None):
+        self.revision = revision
+        self.records = {}
+        self.package_totals = {}  # package -> jumlah file dan kontribusinya
+        self.changed_paths = []
+        self.affected_packages = set()
+        self.symbols = SymbolIndex()
+
+    def _add_totals(self, record, sign):
+        pkg = record["package"]
+        if pkg is None:
+            return
+        totals = self.package_totals.setdefault(pkg, {'files': 0, 'NOMNAMM_Package': 0, 'NOI_Package': 0, 'LOC_Package': 0})
+        totals['files'] += sign
+        for metric, value in zip(_PACKAGE_METRICS, record["package_metrics"].to_list()):
+            totals[metric] += sign * value
+        if totals['files'] == 0:
+            del self.package_totals[pkg]
+
+    def update(self, record):
+        """Tambah atau ganti record untuk record["path"]. Return set package yang terpengaruh."""
+        affected = self.remove(record["path"])
+        self.records[record["path"]] = record
+        self._add_totals(record, 1)
+        self.symbols.add(record)
+        if record["package"] is not None:
+            affected.add(record["package"])
+        return affected
+
+    def remove(self, path):
+        """Hapus record untuk path (jika ada). Return set package yang terpengaruh."""
+        record = self.records.pop(path, None)
+        if record is None:
+            return set()
+        self._add_totals(record, -1)
+        self.symbols.remove(record)
+        return {record["package"]} if record["package"] is not None else set()
+
+    def package_metrics_map(self):
+        return {
+            pkg: {
+                'NOMNAMM_Package': totals['NOMNAMM_Package'],
+                'NOI_Package': totals['NOI_Package'],
+                'LOC_Package': totals['LOC_Package'] + 1
+            }
+            for pkg, totals in self.package_totals.items()
+        }
+
+    def to_dataframe(self, paths=None, cm_scope="file"):
+        """
+        DataFrame metrik (format sama dengan extract_and_parse). Jika paths diberikan,
+        hanya baris dari file tersebut yang diambil; metrik package tetap dari seluruh project.
+        cm_scope="project" menghitung CM dengan tabel simbol seluruh project.
+        """
+        if paths is None:
+            records = list(self.records.values())
+        else:
+            records = [self.records[path] for path in paths if path in self.records]
+        if not records:
+            return pd.DataFrame(columns=METRIC_COLUMNS)
+        if cm_scope == "project":
+            records = apply_project_cm(records, self.symbols)
+        return build_metrics_dataframe(records, self.package_metrics_map())
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            records = {path: encode_record(record) for path, record in self.records.items()}
+            json.dump({"version": ANALYZER_VERSION, "revision": self.revision, "records": records}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Baca index yang disimpan dengan save(). Index dari versi analyzer lain diabaikan (index kosong)."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != ANALYZER_VERSION:
+            return cls()
+        index = cls(data.get("revision"))
+        for record in data["records"].values():
+            index.update(decode_record(record))
+        return index
+
+
+def _git(repo_dir, *args, input_data=None):
+    return subprocess.run(["git", "-C", repo_dir, *args], input=input_data,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+
+
+def _git_read_blobs(repo_dir, revision, paths):
+    # Baca banyak file dari satu revisi sekaligus dengan "git cat-file --batch"
+    if not paths:
+        return
+    request = "".join(f"{revision}:{path}\n" for path in paths).encode("utf-8")
+    output = _git(repo_dir, "cat-file", "--batch", input_data=request)
+    pos = 0
+    for path in paths:
+        header_end = output.index(b"\n", pos)
+        header = output[pos:header_end].split()
+        pos = header_end + 1
+        if header[-1] == b"missing":
+            continue
+        size = int(header[2])
+        yield path, output[pos:pos + size]
+        pos += size + 1
+
+
+def _git_resolve(repo_dir, revision):
+    # Ref simbolik (HEAD, nama branch, tag) -> hash commit, supaya index tetap valid setelah ref bergeser
+    return _git(repo_dir, "rev-parse", "--verify", f"{revision}^{{commit}}").decode("utf-8").strip()
+
+
+def _git_kotlin_files(repo_dir, revision):
+    output = _git(repo_dir, "ls-tree", "-r", "-z", "--name-only", revision)
+    return [path for path in output.decode("utf-8").split("\0") if path and is_kotlin_file(path)]
+
+
+def _git_sources(repo_dir, revision, paths):
+    # revision None = working tree
+    if revision is None:
+        return [(path, None) for path in paths], {path: os.path.join(repo_dir, path) for path in paths}
+    return list(_git_read_blobs(repo_dir, revision, paths)), {}
+
+
+def _analyze_into_index(index, repo_dir, revision, paths, workers, cache):
+    sources, disk_paths = _git_sources(repo_dir, revision, paths)
+    # File working tree dibaca dari disk, tapi record disimpan dengan path relatif repo
+    sources = [(disk_paths.get(path, path), code) for path, code in sources]
+    relative = {disk_paths.get(path, path): path for path in paths}
+    affected = set()
+    for record in analyze_kotlin_sources(sources, workers, None, cache):
+        record = _restore_cached_record(record, relative[record["path"]])
+        affected |= index.update(record)
+    return affected
+
+
+def analyze_git_diff(repo_dir, base_rev, head_rev=None, index=None, workers=1, cache=None):
+    """
+    Analisis incremental untuk working tree git: hanya file Kotlin yang berubah antara
+    base_rev dan head_rev (None = working tree) yang di-parse ulang, lalu hanya agregat
+    package yang terpengaruh (NOMNAMM_Package, NOI_Package, LOC_package) yang berubah.
+
+    index adalah ProjectIndex hasil run sebelumnya untuk base_rev. Jika None, index untuk
+    base_rev dibangun sekali dari seluruh file (gunakan cache agar run berikutnya murah).
+    Return ProjectIndex untuk head_rev; atribut changed_paths dan affected_packages berisi
+    file dan package yang berubah. Pakai index.to_dataframe() untuk tabel metrik.
+
+    repo_dir boleh subfolder dari repo; path di index selalu relatif terhadap root repo.
+    Revisi disimpan di index sebagai hash commit (bukan "HEAD" atau nama branch), dan
+    untuk working tree file Kotlin baru yang belum di-track (tidak di-ignore) ikut dianalisis.
+    """
+    if isinstance(cache, str):
+        cache = MetricCache(cache)
+    repo_dir = _git(repo_dir, "rev-parse", "--show-toplevel").decode("utf-8").strip()
+    base_rev = _git_resolve(repo_dir, base_rev)
+    if head_rev is not None:
+        head_rev = _git_resolve(repo_dir, head_rev)
+    if index is None:
+        index = ProjectIndex(base_rev)
+        _analyze_into_index(index, repo_dir, base_rev, _git_kotlin_files(repo_dir, base_rev), workers, cache)
+    elif index.revision is not None and index.revision != base_rev:
+        raise ValueError(f"Index dibuat untuk revisi {index.revision}, bukan {base_rev}")
+
+    diff_args = ["diff", "--name-status", "-z", "--no-renames", base_rev]
+    if head_rev is not None:
+        diff_args.append(head_rev)
+    fields = [field for field in _git(repo_dir, *diff_args).decode("utf-8").split("\0") if field]
+    if head_rev is None:
+        # File baru yang belum di-track tidak muncul di git diff
+        untracked = _git(repo_dir, "ls-files", "--others", "--exclude-standard", "-z").decode("utf-8").split("\0")
+        for path in untracked:
+            if path:
+                fields += ["A", path]
+
+    changed = []
+    affected = set()
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if not is_kotlin_file(path):
+            continue
+        if status == "D":
+            affected |= index.remove(path)
+        else:
+            changed.append(path)
+    affected |= _analyze_into_index(index, repo_dir, head_rev, changed, workers, cache)
+
+    index.revision = head_rev
+    index.changed_paths = changed
+    index.affected_packages = affected
+    return index
+
+
+@contextlib.contextmanager
+def open_archive_sources(file, stream=True, profiler=None, exclude=None, relative=False):
+    """
+    Context manager yang menghasilkan iterable (path, code) untuk semua file Kotlin di arsip.
+    Zip/tar dibaca langsung dari memori (stream=True); format lain diekstrak dengan patoolib
+    ke temporary directory yang dihapus saat context selesai.
+    File yang cocok dengan pola glob exclude (misalnya DEFAULT_EXCLUDES) tidak dibaca.
+    Dengan relative=True, file hasil ekstrak patoolib juga dibaca ke memori dan diberi
+    path relatif terhadap root arsip (sama seperti nama member zip/tar).
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Zip/tar dibaca langsung dari memori, tanpa ekstrak ke disk; tahap "extract" dicatat
+        # per member saat sources dikonsumsi (lihat iter_archive_sources)
+        sources = iter_archive_sources(file, exclude, profiler) if stream else None
+        if sources is None:
+            with stage(profiler, "extract"):
+                # Tulis file ke temporary directory
+                temp_file_path = os.path.join(temp_dir, file.name)
+                with open(temp_file_path, "wb") as f:
+                    f.write(file.getbuffer())
+
+                # Ekstrak arsip
+                patoolib.extract_archive(temp_file_path, outdir=temp_dir)
+                
+                # Cari semua file Kotlin
+                kotlin_files = [
+                    os.path.join(root, f)
+                    for root, _, files in os.walk(temp_dir)
+                    for f in files
+                    if is_kotlin_file(f) and not is_excluded(os.path.relpath(os.path.join(root, f), temp_dir), exclude)
+                ]
+                if relative:
+                    sources = []
+                    for kotlin_file in kotlin_files:
+                        with open(kotlin_file, "rb") as f:
+                            sources.append((os.path.relpath(kotlin_file, temp_dir).replace(os.sep, "/"), f.read()))
+                else:
+                    sources = [(kotlin_file, None) for kotlin_file in kotlin_files]
+        yield sources
+
+
+def _error_dataframe(error, mode="parsed"):
+    # Satu baris Error dengan skema yang sama dengan hasil normal (METRIC_COLUMNS, LOC numerik)
+    results = ColumnarResults()
+    results.append(error_row("Error", error).replace(mode=mode))
+    return results.to_dataframe({})
+
+
+def extract_and_parse(file, workers=1, chunksize=None, cache=None, stream=True, profiler=None, cm_scope="file",
+                      progress=None, cancel=None, max_file_bytes=None, parse_timeout=None, on_limit="error",
+                      dedup=True, exclude=None, mode="parsed"):
+    """
+    Ekstrak arsip yang di-upload lalu hitung metrik semua file Kotlin di dalamnya.
+    workers > 1 (atau None untuk semua CPU) membagi file ke ProcessPoolExecutor;
+    hasilnya identik dengan mode serial.
+    cache bisa berupa MetricCache atau path file SQLite untuk cache metrik per file.
+    Dengan stream=True, arsip zip/tar dibaca langsung dari memori; format lain
+    (atau stream=False) diekstrak ke temporary directory dengan patoolib.
+    profiler (profiling.Profiler) opsional untuk mencatat waktu per tahap dan per file.
+    cm_scope="project" menghitung CM terhadap method di seluruh project (SymbolIndex),
+    default "file" hanya method di file yang sama.
+    progress(record) dipanggil setiap satu file selesai dianalisis. Jika cancel
+    (threading.Event) di-set, AnalysisCancelled di-raise (bukan DataFrame error).
+    max_file_bytes, parse_timeout, dan on_limit membatasi ukuran dan waktu parse per
+    file (lihat analyze_kotlin_sources).
+    dedup=True menganalisis file dengan isi identik hanya sekali; exclude berisi pola glob
+    path yang dilewati sebelum dibaca (misalnya DEFAULT_EXCLUDES untuk folder build/generated).
+    mode="lexical" untuk triage cepat tanpa parse kopyt (lihat lexical_record); kolom Mode
+    berisi "parsed" atau "lexical" untuk setiap baris.
+    """
+    if isinstance(cache, str):
+        cache = MetricCache(cache)
+    try:
+        with open_archive_sources(file, stream, profiler, exclude) as sources:
+            # Pass 1: Parse setiap file sekali (serial atau paralel)
+            with stage(profiler, "analyze"):
+                records = analyze_kotlin_sources(sources, workers, chunksize, cache, profiler, progress, cancel,
+                                                 max_file_bytes, parse_timeout, on_limit, dedup, mode)
+
+        if not records:
+            return _error_dataframe("No Kotlin files found in archive", mode)
+
+        if cm_scope == "project":
+            with stage(profiler, "symbols"):
+                records = apply_project_cm(records)
+
+        # Pass 2: Metrik package-level agregat dan baris TOTAL
+        with stage(profiler, "dataframe"):
+            return build_metrics_dataframe(records)
+
+    except AnalysisCancelled:
+        raise
+    except Exception as e:
+        return _error_dataframe(f"Archive extraction error: {str(e)}", mode)
+
+# Kolom numerik per baris (tanpa metrik package-level) yang dijumlahkan ke ringkasan
+_ROW_NUMERIC_COLUMNS = [column for column in ROW_COLUMNS if column in _INT_COLUMNS or column in _FLOAT_COLUMNS]
+
+
+class StreamingSummary:
+    """
+    Total berjalan untuk output streaming: jumlah metrik per baris dan jumlah baris
+    per package, plus kontribusi metrik package-level tiap file. Memori sebanding
+    dengan jumlah package, bukan jumlah baris.
+    """
+
+    def __init__(self):
+        self.row_sums = {}
+        self.row_counts = {}
+        self.package_metrics_map = {}
+
+    def add_records(self, records):
+        # Sama dengan aggregate_package_metrics, tapi bertahap per batch
+        for record in records:
+            if record["package"] is None:
+                continue
+            pkg_metrics = self.package_metrics_map.setdefault(record["package"], {
+                'NOMNAMM_Package': 0,
+                'NOI_Package': 0,
+                'LOC_Package': 1
+            })
+            for metric, value in zip(_PACKAGE_METRICS, record["package_metrics"].to_list()):
+                pkg_metrics[metric] += value
+
+    def add_rows(self, df):
+        if df.empty:
+            return
+        grouped = df.groupby("Package", observed=True, sort=False)[_ROW_NUMERIC_COLUMNS]
+        sums = grouped.sum()
+        counts = grouped.size()
+        for package, values in zip(sums.index, sums.to_numpy(dtype=np.float64)):
+            if package in self.row_sums:
+                self.row_sums[package] += values
+            else:
+                self.row_sums[package] = values.copy()
+            self.row_counts[package] = self.row_counts.get(package, 0) + int(counts[package])
+
+    def to_dataframe(self):
+        """
+        Satu baris per package (jumlah metrik per baris dan metrik package-level-nya),
+        lalu baris TOTAL yang nilainya sama dengan baris TOTAL di extract_and_parse.
+        """
+        rows = []
+        for package, sums in self.row_sums.items():
+            row = {"Package": package, "Rows": self.row_counts[package]}
+            row.update(zip(_ROW_NUMERIC_COLUMNS, sums.tolist()))
+            pkg_metrics = self.package_metrics_map.get(package, {})
+            for column, metric in PACKAGE_COLUMNS:
+                row[column] = pkg_metrics.get(metric, 0)
+            rows.append(row)
+        columns = ["Package", "Rows"] + [column for column in METRIC_COLUMNS
+                                         if column in _ROW_NUMERIC_COLUMNS or column in dict(PACKAGE_COLUMNS)]
+        summary = pd.DataFrame(rows, columns=columns)
+
+        # Metrik package-level di DataFrame biasa terisi di setiap baris,
+        # jadi totalnya = jumlah baris package x nilai metrik package
+        total = {"Package": "TOTAL", "Rows": int(summary["Rows"].sum())}
+        for column in columns[2:]:
+            if column in dict(PACKAGE_COLUMNS):
+                total[column] = float((summary["Rows"] * summary[column]).sum())
+            else:
+                total[column] = float(summary[column].sum())
+        return pd.concat([summary, pd.DataFrame([total])], ignore_index=True)
+
+
+class _CsvBatchWriter:
+    def __init__(self, path):
+        self.path = path
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        if self._header:
+            # Tetap tulis header walaupun tidak ada baris sama sekali
+            pd.DataFrame(columns=ROW_COLUMNS).to_csv(self.path, index=False)
+
+
+class _ParquetBatchWriter:
+    # Satu row group per batch; skema eksplisit agar semua batch konsisten
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        fields = []
+        for column in ROW_COLUMNS:
+            if column in _INT_COLUMNS:
+                fields.append(pa.field(column, pa.int64()))
+            elif column in _FLOAT_COLUMNS:
+                fields.append(pa.field(column, pa.float64()))
+            else:
+                fields.append(pa.field(column, pa.string()))
+        self.schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, df):
+        df = df.astype({"Package": object, "Class": object, "Mode": object})
+        self._writer.write_table(self._pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self._writer.close()
+
+
+def _batch_writer(path, fmt):
+    if fmt == "csv":
+        return _CsvBatchWriter(path)
+    if fmt == "parquet":
+        return _ParquetBatchWriter(path)
+    raise ValueError(f"Format output tidak dikenal: {fmt}")
+
+
+def summary_path_for(output_path):
+    """out.parquet -> out.summary.parquet"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.summary{ext}"
+
+
+def extract_to_file(file, output_path, fmt=None, summary_path=None, batch_files=200, workers=1, chunksize=None,
+                    cache=None, stream=True, profiler=None, max_file_bytes=None, parse_timeout=None, on_limit="error",
+                    dedup=True, exclude=None, smells=None, mode="parsed"):
+    """
+    Seperti extract_and_parse, tapi baris metrik ditulis bertahap ke output_path
+    (Parquet: satu row group per batch, CSV: append) setiap batch_files file selesai,
+    sehingga memori tidak bertambah dengan ukuran project.
+
+    Baris output tidak berisi kolom metrik package-level (nilainya baru final setelah
+    semua file dianalisis); metrik package dan baris TOTAL ditulis terpisah ke
+    summary_path (default: output_path dengan sisipan ".summary").
+    fmt "csv" atau "parquet"; jika None ditebak dari ekstensi output_path.
+    dedup, exclude, dan mode sama seperti extract_and_parse (dedup berlaku per batch).
+    smells: objek dengan method add(df) (misalnya smells.SmellEvaluator) yang menerima
+    setiap batch baris sebelum ditulis, untuk deteksi code smell bertahap.
+    Return DataFrame ringkasan (per package + TOTAL).
+    """
+    if fmt is None:
+        fmt = "parquet" if output_path.lower().endswith((".parquet", ".pq")) else "csv"
+    if summary_path is None:
+        summary_path = summary_path_for(output_path)
+    if isinstance(cache, str):
+        cache = MetricCache(cache)
+
+    summary = StreamingSummary()
+    writer = _batch_writer(output_path, fmt)
+    # Satu set worker process untuk semua batch, bukan dibuat ulang per batch
+    pool = AnalysisPool(workers)
+    try:
+        with pool, open_archive_sources(file, stream, profiler, exclude) as sources:
+            sources = iter(sources)
+            while True:
+                batch = list(itertools.islice(sources, batch_files))
+                if not batch:
+                    break
+                with stage(profiler, "analyze"):
+                    records = analyze_kotlin_sources(batch, workers, chunksize, cache, profiler,
+                                                     max_file_bytes=max_file_bytes, parse_timeout=parse_timeout,
+                                                     on_limit=on_limit, dedup=dedup, mode=mode, pool=pool)
+                with stage(profiler, "write"):
+                    results = ColumnarResults()
+                    for record in records:
+                        results.extend(record["rows"])
+                    df = results.to_dataframe(None)
+                    summary.add_records(records)
+                    summary.add_rows(df)
+                    if len(df):
+                        if smells is not None:
+                            smells.add(df)
+                        writer.write(df)
+    finally:
+        writer.close()
+
+    summary_df = summary.to_dataframe()
+    if fmt == "parquet":
+        summary_df.to_parquet(summary_path, index=False)
+    else:
+        summary_df.to_csv(summary_path, index=False)
+    return summary_df
+
+def _source_digest(kotlin_file, code):
+    return hashlib.sha256(code.encode("utf-8") if isinstance(code, str) else code).hexdigest()
+
+
+def _read_archive_digests(file, stream, profiler, exclude):
+    # path relatif di arsip -> (isi bytes, hash isi)
+    with open_archive_sources(file, stream, profiler, exclude, relative=True) as sources:
+        return {kotlin_file: (code, _source_digest(kotlin_file, code)) for kotlin_file, code in sources}
+
+
+def _keyed_rows(records):
+    # Baris per method dengan key hash Package/Class/Method plus nomor kemunculan (untuk overload)
+    results = ColumnarResults()
+    for record in records:
+        results.extend(record["rows"])
+    df = results.to_dataframe(None).astype({"Package": object, "Class": object})
+    keys = pd.util.hash_pandas_object(df[["Package", "Class", "Method"]], index=False).to_numpy()
+    df["_key"] = keys
+    df["_occurrence"] = pd.Series(keys).groupby(keys).cumcount().to_numpy()
+    return df
+
+
+def compare_archives(old_file, new_file, workers=1, chunksize=None, cache=None, stream=True, profiler=None,
+                     exclude=None):
+    """
+    Bandingkan metrik dua versi arsip (misalnya release N dan N+1).
+    File dengan path dan isi (hash) yang sama di kedua arsip dilewati tanpa di-parse;
+    file yang berbeda dianalisis sekali per isi unik (dedup), lalu baris kedua versi
+    di-join secara vektor pada key hash Package/Class/Method (plus nomor kemunculan
+    untuk method overload).
+
+    Return DataFrame dengan kolom Package, Class, Method, Status ("added", "removed",
+    "changed") serta <metrik>_old, <metrik>_new, dan <metrik>_delta untuk setiap metrik
+    per baris (metrik package-level tidak ikut). Method yang metriknya sama tidak dimasukkan.
+    df.attrs["files"] berisi jumlah file unchanged dan daftar file changed/added/removed.
+    """
+    if isinstance(cache, str):
+        cache = MetricCache(cache)
+    # Tahap "extract" dicatat di dalam open_archive_sources, di sini hanya total baca + hash
+    with stage(profiler, "read"):
+        old_sources = _read_archive_digests(old_file, stream, profiler, exclude)
+        new_sources = _read_archive_digests(new_file, stream, profiler, exclude)
+
+    unchanged = [path for path, (_, digest) in new_sources.items()
+                 if path in old_sources and old_sources[path][1] == digest]
+    skip = set(unchanged)
+    old_diff = [(path, code) for path, (code, _) in old_sources.items() if path not in skip]
+    new_diff = [(path, code) for path, (code, _) in new_sources.items() if path not in skip]
+
+    # Satu kali analisis untuk kedua sisi: isi yang sama (misalnya file pindah path) cukup di-parse sekali
+    with stage(profiler, "analyze"):
+        records = analyze_kotlin_sources(old_diff + new_diff, workers, chunksize, cache, profiler, dedup=True)
+    old_rows = _keyed_rows(records[:len(old_diff)])
+    new_rows = _keyed_rows(records[len(old_diff):])
+
+    with stage(profiler, "diff"):
+        merged = old_rows.merge(new_rows, on=["_key", "_occurrence"], how="outer", suffixes=("_old", "_new"),
+                                indicator=True, sort=False)
+        diff = pd.DataFrame({
+            column: merged[f"{column}_new"].where(merged["_merge"] != "left_only", merged[f"{column}_old"])
+            for column in ("Package", "Class", "Method")
+        })
+        diff["Status"] = merged["_merge"].map({"left_only": "removed", "right_only": "added", "both": "changed"}
+                                              ).astype(object)
+        changed = merged["_merge"] != "both"
+        for column in _ROW_NUMERIC_COLUMNS:
+            old_values = merged[f"{column}_old"]
+            new_values = merged[f"{column}_new"]
+            diff[f"{column}_old"] = old_values
+            diff[f"{column}_new"] = new_values
+            diff[f"{column}_delta"] = new_values.fillna(0) - old_values.fillna(0)
+            changed |= diff[f"{column}_delta"] != 0
+        diff = diff[changed.to_numpy()]
+        diff = diff.sort_values(["Package", "Class", "Method"], kind="stable").reset_index(drop=True)
+
+    changed_paths = set(path for path, _ in old_diff) & set(path for path, _ in new_diff)
+    diff.attrs["files"] = {
+        "unchanged": len(unchanged),
+        "changed": sorted(changed_paths),
+        "added": sorted(path for path, _ in new_diff if path not in changed_paths),
+        "removed": sorted(path for path, _ in old_diff if path not in changed_paths),
+    }
+    return diff
\ No newline at end of file
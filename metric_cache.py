@@ -0,0 +1,126 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class MetricCache:
+    """
+    Cache metrik per file yang disimpan di SQLite.
+    Key adalah hash konten file (plus versi analyzer), value adalah record hasil
+    analisis per file dalam bentuk JSON. Jika total ukuran melebihi max_bytes,
+    entry yang paling lama tidak dipakai (LRU) dihapus.
+
+    Total ukuran disimpan berjalan di memori (dihitung sekali saat cache dibuka), jadi
+    put tidak perlu SUM atas seluruh tabel. Di dalam blok batch(), update last_used
+    dan insert ditulis dalam satu transaksi yang di-commit di akhir blok.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metrics_last_used ON metrics (last_used)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metrics").fetchone()[0]
+        self._touched = {}  # key -> last_used yang belum ditulis ke database
+        self._batch_depth = 0
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Kelompokkan get/put dalam satu transaksi, misalnya untuk satu kali analisis:
+        last_used dan entry baru di-commit sekali di akhir blok, bukan per file.
+        Boleh bersarang; commit terjadi saat blok terluar selesai.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE metrics SET last_used = ? WHERE key = ?",
+                                   [(last_used, key) for key, last_used in self._touched.items()])
+            self._touched.clear()
+
+    def _commit(self):
+        self._flush_touched()
+        self._conn.commit()
+
+    def get(self, key):
+        """Ambil record untuk key, atau None jika belum ada di cache."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM metrics WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if not self._batch_depth:
+                self._commit()
+        return json.loads(row[0])
+
+    def put(self, key, record):
+        """Simpan record untuk key, lalu buang entry lama jika cache melebihi max_bytes."""
+        data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM metrics WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metrics (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+            self._touched.pop(key, None)
+            self._total += len(data) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            if not self._batch_depth:
+                self._commit()
+
+    def _evict(self):
+        # last_used yang tertunda ditulis dulu supaya entry yang baru dipakai tidak ikut terhapus.
+        # Entry tertua diambil bertahap lewat index last_used, bukan seluruh tabel.
+        self._flush_touched()
+        while self._total > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM metrics ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                self._total = 0
+                return
+            for key, size in rows:
+                if self._total <= self.max_bytes:
+                    return
+                self._conn.execute("DELETE FROM metrics WHERE key = ?", (key,))
+                self._total -= size
+
+    def size(self):
+        """Total ukuran data (byte) yang tersimpan di cache."""
+        with self._lock:
+            return self._total
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM metrics")
+            self._touched.clear()
+            self._total = 0
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
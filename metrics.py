@@ -0,0 +1,579 @@
+# Metrik berbasis teks yang ringan: tidak butuh pandas, numpy, patoolib, maupun kopyt.
+# "from metrics import count_cc_manual" jauh lebih cepat daripada import controller;
+# controller me-re-export semua nama di sini.
+import functools
+import re
+from collections import Counter
+
+
+def manual_max_nesting(code):
+    """Max Nesting dari token body (lihat lexical_body_metrics)."""
+    return method_tokens(code).body_metrics()[1]
+
+def count_cc_manual(code):
+    """CC dari token body (lihat lexical_body_metrics)."""
+    return method_tokens(code).body_metrics()[0]
+
+def count_woc(cc_values):
+    total = sum(cc_values)
+    return [cc / total if total > 0 else 0 for cc in cc_values]
+
+def count_mamcl(code):
+    """
+    MaMCL dari token body: komentar dan isi string tidak ikut, angka desimal (1.5)
+    adalah satu token, dan chain hanya dihitung untuk ".nama(" berturut-turut.
+    """
+    return method_tokens(code).body_metrics()[2]
+
+
+IDENTIFIER_RE = re.compile(r'[^\W\d]\w*')
+
+
+def call_site_index(method_code):
+    """
+    Set nama yang dipanggil (identifier diikuti "(") di body method, dari token stream
+    body (method_code boleh str atau TokenStream). Komentar dan isi string tidak ikut.
+    """
+    stream = method_code if isinstance(method_code, TokenStream) else method_tokens(method_code)
+    return stream.call_sites()
+
+
+class MethodNameIndex:
+    """
+    Nama method di file untuk CM, dihitung per kemunculan (nama yang dideklarasikan
+    dua kali tetap dihitung dua kali, sama seperti list all_methods_in_file).
+    """
+
+    def __init__(self, method_names):
+        self.counts = Counter(method_names)
+        # Nama dengan backtick (mis. `my test`) bukan identifier biasa, tidak bisa masuk call-site index
+        self.escaped_names = [name for name in self.counts if not IDENTIFIER_RE.fullmatch(name)]
+
+
+def count_cm_method(method_code, all_methods_in_file, call_sites=None):
+    """
+    Count Coupling between Methods (CM).
+    Body method ditokenisasi sekali menjadi call-site index, lalu CM dihitung dari
+    irisan index tersebut dengan nama method di file (bukan regex per nama per baris).
+    """
+    if not isinstance(all_methods_in_file, MethodNameIndex):
+        all_methods_in_file = MethodNameIndex(all_methods_in_file)
+    stream = method_code if isinstance(method_code, TokenStream) else method_tokens(method_code)
+    if call_sites is None:
+        call_sites = stream.call_sites()
+
+    counts = all_methods_in_file.counts
+    if len(call_sites) <= len(counts):
+        count = sum(counts[name] for name in call_sites if name in counts)
+    else:
+        count = sum(n for name, n in counts.items() if name in call_sites)
+
+    for method_name in all_methods_in_file.escaped_names:
+        # Nama non-identifier dicari dengan regex "methodName(" di teks yang sudah di-strip
+        pattern = re.compile(r'\b' + re.escape(method_name) + r'\s*\(')
+        if pattern.search(stream.code):
+            count += counts[method_name]  # Count once per distinct method called within the current method
+    return count
+
+
+def count_loc_type(class_code):
+    return class_code.count("\n") + 1
+
+
+_WORD_RE = re.compile(r'\w+')
+_ASCII_IDENTIFIER_RE = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+
+# Keyword yang tidak dihitung sebagai akses atribut langsung di count_noav
+NOAV_KEYWORDS = frozenset({
+    "if", "for", "while", "when", "catch", "case", "else", "return", "val", "var", "fun",
+    "true", "false", "null", "override", "private", "public", "protected", "internal", "class",
+    "object", "interface", "companion", "constructor", "init", "super", "this", "in", "is", "as","do", "try", "finally", "throw", "typeof", "sealed", "data", "lateinit"
+})
+
+
+class IdentifierIndex:
+    """
+    Index identifier dari satu body method, dibangun dari token stream body (komentar
+    dan isi string tidak ikut). Dipakai bersama oleh noav_method dan count_noav sehingga
+    NOAV cukup dihitung dengan irisan set, bukan regex per property.
+    code boleh str atau TokenStream.
+
+    - words: semua identifier di body
+    - qualified: nama setelah this. atau super.
+    - direct: akses langsung (tidak didahului "." dan tidak diikuti "(")
+    - called: nama yang langsung diikuti "("
+    - local_vars: nama yang dideklarasikan dengan val/var
+    """
+
+    def __init__(self, code):
+        self.words = set()
+        self.qualified = set()
+        self.direct = set()
+        self.called = set()
+        self.local_vars = set()
+
+        tokens = code.tokens if isinstance(code, TokenStream) else method_tokens(code).tokens
+        n = len(tokens)
+        for i, token in enumerate(tokens):
+            if not _is_name(token):
+                continue
+            if token[0] == "`":
+                self.words.update(_WORD_RE.findall(token))
+                continue
+            self.words.add(token)
+            ascii_ident = _ASCII_IDENTIFIER_RE.match(token)
+            is_ascii_ident = ascii_ident is not None and ascii_ident.end() == len(token)
+            before = tokens[i - 1] if i else ""
+
+            if before == "." or before == "?.":
+                if before == "." and i >= 2 and tokens[i - 2] in ("this", "super") and is_ascii_ident:
+                    self.qualified.add(token)
+            elif before in ("val", "var") and ascii_ident is not None:
+                self.local_vars.add(ascii_ident.group())
+
+            if i + 1 < n and tokens[i + 1] == "(":
+                self.called.add(token)
+            elif is_ascii_ident and before != "." and before != "?.":
+                self.direct.add(token)
+
+
+# --- Tokenizer Kotlin leksikal (tanpa parser) ---
+
+# Awal komentar atau literal string/char; di dalam template ${...} kurung kurawal ikut dicari
+_LITERAL_START_RE = re.compile(r'//|/\*|"""|"|\'')
+_TEMPLATE_START_RE = re.compile(r'//|/\*|"""|"|\'|[{}]')
+_BLOCK_COMMENT_RE = re.compile(r'/\*|\*/')
+_CHAR_LITERAL_RE = re.compile(r"'(?:\\.|[^\\'\n])*'")
+_STRING_RUN_RE = re.compile(r'[^"\\\n$]+')
+_RAW_STRING_RUN_RE = re.compile(r'[^"$]+')
+_NON_NEWLINE_RE = re.compile(r'[^\n]')
+
+
+def _blank(text):
+    # Isi diganti spasi, newline dipertahankan supaya posisi dan nomor baris tetap sama
+    if "\n" not in text:
+        return " " * len(text)
+    return _NON_NEWLINE_RE.sub(" ", text)
+
+
+def _block_comment_end(code, i):
+    # Komentar blok Kotlin boleh bersarang: /* a /* b */ c */
+    depth = 1
+    for match in _BLOCK_COMMENT_RE.finditer(code, i):
+        depth += 1 if match.group() == "/*" else -1
+        if depth == 0:
+            return match.end()
+    return len(code)
+
+
+def _strip_code(code, pos, parts, template=False):
+    # Salin kode ke parts dengan komentar/literal di-strip. Untuk template=True (pos tepat
+    # setelah "${") berhenti di "}" penutup template; return index "}" tersebut.
+    search = (_TEMPLATE_START_RE if template else _LITERAL_START_RE).search
+    n = len(code)
+    depth = 0
+    while True:
+        match = search(code, pos)
+        if match is None:
+            parts.append(code[pos:])
+            return n
+        start = match.start()
+        token = match.group()
+        parts.append(code[pos:start])
+        if token == "{":
+            depth += 1
+            parts.append(token)
+            end = start + 1
+        elif token == "}":
+            if depth == 0:
+                return start
+            depth -= 1
+            parts.append(token)
+            end = start + 1
+        elif token == "//":
+            end = code.find("\n", start)
+            end = n if end == -1 else end
+            parts.append(" " * (end - start))
+        elif token == "/*":
+            end = _block_comment_end(code, start + 2)
+            parts.append(_blank(code[start:end]))
+        elif token == "'":
+            char = _CHAR_LITERAL_RE.match(code, start)
+            if char is None:
+                parts.append(token)
+                end = start + 1
+            else:
+                end = char.end()
+                parts.append("'" + " " * (end - start - 2) + "'")
+        else:
+            parts.append('"' + " " * (len(token) - 1))
+            end = _strip_string(code, start + len(token), token == '"""', parts)
+        pos = end
+
+
+def _strip_string(code, i, raw, parts):
+    # i tepat setelah tanda kutip pembuka; teks literal di-blank, $nama dan isi ${...}
+    # tetap sebagai kode. Return index setelah tanda kutip penutup.
+    run_re = _RAW_STRING_RUN_RE if raw else _STRING_RUN_RE
+    n = len(code)
+    while i < n:
+        run = run_re.match(code, i)
+        if run:
+            parts.append(_blank(run.group()))
+            i = run.end()
+            continue
+        c = code[i]
+        if c == "$":
+            if code.startswith("${", i):
+                parts.append("  ")
+                i = _strip_code(code, i + 2, parts, template=True)
+                if i < n:
+                    parts.append(" ")
+                    i += 1
+                continue
+            name = IDENTIFIER_RE.match(code, i + 1)
+            if name:
+                parts.append(" " + name.group())
+                i = name.end()
+                continue
+            parts.append(" ")
+            i += 1
+            continue
+        if raw:
+            if code.startswith('"""', i):
+                # Tanda kutip tambahan sebelum """ penutup masih bagian dari isi string
+                extra = 0
+                while code.startswith('""""', i + extra):
+                    extra += 1
+                parts.append(" " * (extra + 2) + '"')
+                return i + extra + 3
+            parts.append(" ")
+            i += 1
+        elif c == '"':
+            parts.append(c)
+            return i + 1
+        elif c == "\\":
+            escape = code[i:i + 2]
+            parts.append(_blank(escape))
+            i += len(escape)
+        else:
+            return i  # newline: string tidak ditutup
+    return n
+
+
+def strip_comments_and_strings(code):
+    """
+    Hapus komentar (termasuk komentar blok bersarang) dan teks literal string/char dalam
+    satu kali scan. Panjang teks dan posisi newline tidak berubah: komentar menjadi spasi,
+    literal menjadi tanda kutip dengan isi spasi. Template string tetap dihitung sebagai
+    kode: "$count" menjadi " count" dan "${helper()}" menjadi "  helper() ".
+    """
+    parts = []
+    _strip_code(code, 0, parts)
+    return "".join(parts)
+
+
+_TOKEN_RE = re.compile(r'`[^`\n]*`|[^\W\d]\w*|\d\w*(?:\.\d\w*)?|\?\.|->|::|!!|@\w*|[^\s\w]')
+
+
+def kotlin_tokens(stripped):
+    """Token dari kode yang sudah di-strip, sebagai (list teks token, list posisi awal token)."""
+    tokens = []
+    starts = []
+    for match in _TOKEN_RE.finditer(stripped):
+        tokens.append(match.group())
+        starts.append(match.start())
+    return tokens, starts
+
+
+def _is_name(token):
+    first = token[:1]
+    return first.isalpha() or first == "_" or first == "`"
+
+
+_OPEN_BRACKETS = frozenset("([{")
+_CLOSE_BRACKETS = frozenset(")]}")
+_PAIRS = {"(": ")", "[": "]", "{": "}", "<": ">"}
+
+# Keyword yang selalu memulai deklarasi baru, dan modifier yang memulai deklarasi jika diikuti nama/keyword
+_DECLARATION_KEYWORDS = frozenset({"fun", "val", "var", "class", "interface", "object", "typealias", "import",
+                                   "package"})
+_MODIFIER_KEYWORDS = frozenset({
+    "private", "public", "protected", "internal", "override", "open", "abstract", "final", "data", "enum",
+    "sealed", "inline", "suspend", "const", "lateinit", "inner", "annotation", "companion", "external",
+    "operator", "infix", "tailrec", "expect", "actual", "value"
+})
+
+
+def _skip_balanced(tokens, i, n):
+    # tokens[i] adalah kurung buka; return index setelah kurung tutup pasangannya
+    open_token = tokens[i]
+    close_token = _PAIRS[open_token]
+    depth = 0
+    while i < n:
+        token = tokens[i]
+        if token == open_token:
+            depth += 1
+        elif token == close_token:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def _declaration_start(tokens, k, n):
+    token = tokens[k]
+    if token in _DECLARATION_KEYWORDS:
+        return True
+    following = tokens[k + 1] if k + 1 < n else ""
+    if token in _MODIFIER_KEYWORDS:
+        return _is_name(following)
+    return (token == "init" and following == "{") or (token == "constructor" and following == "(")
+
+
+def _expression_end(tokens, k, n):
+    # Akhir body ekspresi (fun f() = ...): deklarasi berikutnya atau kurung tutup scope luar
+    start = k
+    depth = 0
+    while k < n:
+        token = tokens[k]
+        if token in _OPEN_BRACKETS:
+            depth += 1
+        elif token in _CLOSE_BRACKETS:
+            if depth == 0:
+                return k
+            depth -= 1
+        elif depth == 0 and k > start:
+            if _declaration_start(tokens, k, n):
+                return k
+            if token[0] == "@" and len(token) > 1 and tokens[k - 1] not in ("this", "super", "return", "break",
+                                                                            "continue"):
+                return k  # anotasi deklarasi berikutnya
+        k += 1
+    return n
+
+
+def _scan_function(tokens, i, n):
+    """
+    tokens[i] adalah "fun". Return (nama, lo, hi, end): rentang token body [lo, hi)
+    (None jika tidak punya body) dan index untuk melanjutkan scan.
+    Nama None jika bukan deklarasi fungsi biasa (misalnya "fun interface").
+    """
+    j = i + 1
+    if j < n and tokens[j] == "<":
+        j = _skip_balanced(tokens, j, n)
+    name = None
+    while j < n and tokens[j] != "(":
+        token = tokens[j]
+        if token in ("{", "}", "=") or _declaration_start(tokens, j, n):
+            return None, None, None, j
+        if _is_name(token):
+            name = token
+        j += 1
+    if name is None or j >= n:
+        return None, None, None, j
+    j = _skip_balanced(tokens, j, n)
+    while j < n:
+        token = tokens[j]
+        if token == "{":
+            end = _skip_balanced(tokens, j, n)
+            return name.strip("`"), j, end, end
+        if token == "=":
+            end = _expression_end(tokens, j + 1, n)
+            return name.strip("`"), j + 1, end, end
+        if token == "(":
+            j = _skip_balanced(tokens, j, n)  # tipe function, misalnya (): () -> Unit
+            continue
+        if token == "}" or _declaration_start(tokens, j, n):
+            break
+        j += 1
+    return name.strip("`"), None, None, j
+
+
+def _declaration_body(tokens, j, n):
+    # Index "{" body class/object/interface yang header-nya mulai di j, atau None jika tanpa body
+    while j < n:
+        token = tokens[j]
+        if token == "{":
+            return j
+        if token == "(":
+            j = _skip_balanced(tokens, j, n)
+            continue
+        if token == "}" or _declaration_start(tokens, j, n):
+            return None
+        j += 1
+    return None
+
+
+def _class_methods(tokens, lo, hi):
+    # Fungsi yang langsung berada di body class (bukan di class bersarang, companion object, dsb.)
+    methods = []
+    k = lo
+    while k < hi:
+        token = tokens[k]
+        if token == "{":
+            k = _skip_balanced(tokens, k, hi)
+        elif token == "fun":
+            name, body_lo, body_hi, k = _scan_function(tokens, k, hi)
+            if name is not None:
+                methods.append((name, body_lo, body_hi))
+        else:
+            k += 1
+    return methods
+
+
+def scan_declarations(tokens):
+    """
+    Cari class dan fungsi secara leksikal dari token kotlin_tokens, tanpa parser.
+    Sama seperti analisis AST, yang diambil hanya class dan interface top-level (di kopyt
+    InterfaceDeclaration turunan ClassDeclaration) beserta fungsi yang langsung ada di
+    body-nya, dan fungsi top-level; object tidak punya baris.
+
+    Return (classes, functions, interfaces):
+    - classes: list (nama, index token "class"/"interface", index token setelah "}", methods)
+    - functions / methods: list (nama, lo, hi), rentang token body [lo, hi) atau None jika tanpa body
+    - interfaces: jumlah interface top-level
+    """
+    n = len(tokens)
+    classes = []
+    functions = []
+    interfaces = 0
+    i = 0
+    while i < n:
+        token = tokens[i]
+        if token in _OPEN_BRACKETS:
+            i = _skip_balanced(tokens, i, n)
+            continue
+        if i and tokens[i - 1] in (".", "?.", "::"):
+            i += 1  # misalnya Foo::class
+            continue
+        if token == "fun":
+            name, lo, hi, i = _scan_function(tokens, i, n)
+            if name is not None:
+                functions.append((name, lo, hi))
+            continue
+        if token in ("class", "interface", "object"):
+            if token == "interface":
+                interfaces += 1
+            body = _declaration_body(tokens, i + 1, n)
+            if body is None:
+                i += 1
+                continue
+            end = _skip_balanced(tokens, body, n)
+            if token != "object" and i + 1 < n and _is_name(tokens[i + 1]):
+                classes.append((tokens[i + 1].strip("`"), i, end, _class_methods(tokens, body + 1, end - 1)))
+            i = end
+            continue
+        i += 1
+    return classes, functions, interfaces
+
+
+# Keyword yang menambah CC dan yang membuka level nesting (sama dengan MetricsVisitor)
+_DECISION_KEYWORDS = frozenset({"if", "for", "while", "when", "catch"})
+_NESTING_KEYWORDS = frozenset({"if", "else", "for", "while", "do", "when", "try", "catch", "finally"})
+
+
+def lexical_body_metrics(tokens, lo, hi):
+    """
+    (CC, Max Nesting, MaMCL) dari token body [lo, hi), dengan definisi yang sama seperti
+    MetricsVisitor tetapi tanpa AST:
+    - CC: 1 + jumlah if, for, while, when, dan catch
+    - Max Nesting: blok "{" milik if/else/for/while/do/when/try/catch/finally menambah level;
+      if tanpa kurung kurawal tetap dihitung satu level lebih dalam
+    - MaMCL: rangkaian ".nama(" atau ".nama {" berturut-turut
+    """
+    cc = 1
+    max_nesting = depth = 0
+    mamcl = chain = 0
+    control = set()  # index "{" yang membuka blok kontrol
+    stack = []  # per kurung buka: (blok kontrol?, chain sebelum kurung)
+    i = lo
+    while i < hi:
+        token = tokens[i]
+        if token in _OPEN_BRACKETS:
+            is_control = i in control
+            if is_control:
+                depth += 1
+            stack.append((is_control, chain))
+            chain = 0
+        elif token in _CLOSE_BRACKETS:
+            if stack:
+                is_control, chain = stack.pop()
+                if is_control:
+                    depth -= 1
+            else:
+                chain = 0
+        elif token == "." or token == "?.":
+            if i + 1 < hi and _is_name(tokens[i + 1]):
+                if i + 2 < hi and tokens[i + 2] in ("(", "{"):
+                    chain += 1
+                    if chain > mamcl:
+                        mamcl = chain
+                else:
+                    chain = 0  # navigasi tanpa call memutus chain
+                i += 2
+                continue
+            chain = 0
+        elif token != "!!":
+            chain = 0
+            if token in _NESTING_KEYWORDS:
+                if token in _DECISION_KEYWORDS:
+                    cc += 1
+                following = tokens[i + 1] if i + 1 < hi else ""
+                if not (token == "else" and following == "->"):
+                    if depth + 1 > max_nesting:
+                        max_nesting = depth + 1
+                    j = i + 1
+                    if following == "(":
+                        j = _skip_balanced(tokens, j, hi)
+                    if j < hi and tokens[j] == "{":
+                        control.add(j)
+        i += 1
+    return cc, max_nesting, mamcl
+
+
+class TokenStream:
+    """
+    Token satu body method setelah komentar dan isi literal dihapus. Dibuat sekali per
+    body (lihat method_tokens) lalu dipakai semua metrik teks; hasil turunannya
+    (call site, IdentifierIndex, CC/nesting/MaMCL) juga di-memo di objek ini.
+    """
+    __slots__ = ("code", "tokens", "_call_sites", "_identifiers", "_body_metrics")
+
+    def __init__(self, code, tokens):
+        self.code = code  # teks yang sudah di-strip
+        self.tokens = tokens
+        self._call_sites = None
+        self._identifiers = None
+        self._body_metrics = None
+
+    def call_sites(self):
+        """frozenset nama yang dipanggil (identifier diikuti "(")."""
+        if self._call_sites is None:
+            tokens = self.tokens
+            self._call_sites = frozenset(
+                token for token, following in zip(tokens, tokens[1:])
+                if following == "(" and _is_name(token) and token[0] != "`")
+        return self._call_sites
+
+    def identifiers(self):
+        if self._identifiers is None:
+            self._identifiers = IdentifierIndex(self)
+        return self._identifiers
+
+    def body_metrics(self):
+        """(CC, Max Nesting, MaMCL), lihat lexical_body_metrics."""
+        if self._body_metrics is None:
+            self._body_metrics = lexical_body_metrics(self.tokens, 0, len(self.tokens))
+        return self._body_metrics
+
+
+@functools.lru_cache(maxsize=256)
+def method_tokens(code):
+    """
+    TokenStream untuk body method (di-cache per teks body), sehingga CM, NOAV, dan
+    metrik teks lain untuk body yang sama cukup men-strip dan men-tokenisasi sekali.
+    """
+    stripped = strip_comments_and_strings(code)
+    return TokenStream(stripped, _TOKEN_RE.findall(stripped))
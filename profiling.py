@@ -0,0 +1,106 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Dipakai saat profiling tidak aktif: satu context manager kosong yang bisa dipakai ulang
+NULL_STAGE = contextlib.nullcontext()
+
+
+def stage(profiler, name, file=None, method=None):
+    """profiler.stage(...) jika profiler aktif, selain itu NULL_STAGE (hampir tanpa overhead)."""
+    if profiler is None:
+        return NULL_STAGE
+    return profiler.stage(name, file, method)
+
+
+class Profiler:
+    """
+    Pencatat waktu per tahap analisis (wall time dan CPU time), per file dan per method.
+    Hasilnya bisa diringkas, dicari file/method paling lambat, atau diekspor sebagai
+    laporan JSON maupun file trace event Chrome (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self):
+        self.events = []
+
+    @contextlib.contextmanager
+    def stage(self, name, file=None, method=None):
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            self.events.append({
+                "stage": name,
+                "file": file,
+                "method": method,
+                "start": start,
+                "wall": time.perf_counter() - start,
+                "cpu": time.process_time() - cpu_start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            })
+
+    def extend(self, events):
+        """Gabungkan event dari profiler lain (misalnya dari worker process)."""
+        self.events.extend(events)
+
+    def summary(self):
+        """Total wall/CPU time dan jumlah kejadian per tahap."""
+        totals = {}
+        for event in self.events:
+            total = totals.setdefault(event["stage"], {"wall": 0.0, "cpu": 0.0, "count": 0})
+            total["wall"] += event["wall"]
+            total["cpu"] += event["cpu"]
+            total["count"] += 1
+        return totals
+
+    def slowest_files(self, n=10):
+        """n file dengan total wall time terbesar (parse + hitung metrik)."""
+        per_file = {}
+        for event in self.events:
+            if event["file"] is not None and event["method"] is None and event["stage"] in ("parse", "methods"):
+                per_file[event["file"]] = per_file.get(event["file"], 0.0) + event["wall"]
+        return sorted(per_file.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def slowest_methods(self, n=10):
+        """n method dengan wall time terbesar, sebagai (file, method, detik)."""
+        methods = [e for e in self.events if e["stage"] == "method"]
+        methods.sort(key=lambda e: e["wall"], reverse=True)
+        return [(e["file"], e["method"], e["wall"]) for e in methods[:n]]
+
+    def report(self, n=10):
+        return {
+            "stages": self.summary(),
+            "slowest_files": [{"file": f, "wall": wall} for f, wall in self.slowest_files(n)],
+            "slowest_methods": [{"file": f, "method": m, "wall": wall} for f, m, wall in self.slowest_methods(n)],
+        }
+
+    def to_json(self, path, n=10):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(n), f, indent=2)
+
+    def to_chrome_trace(self, path):
+        """Tulis event dalam format Chrome trace event (complete event, satuan mikrodetik)."""
+        origin = min((e["start"] for e in self.events), default=0.0)
+        trace_events = []
+        for event in self.events:
+            args = {"cpu_ms": event["cpu"] * 1000}
+            if event["file"] is not None:
+                args["file"] = event["file"]
+            if event["method"] is not None:
+                args["method"] = event["method"]
+            trace_events.append({
+                "name": event["stage"],
+                "cat": "metrics",
+                "ph": "X",
+                "ts": (event["start"] - origin) * 1e6,
+                "dur": event["wall"] * 1e6,
+                "pid": event["pid"],
+                "tid": event["tid"],
+                "args": args,
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,178 @@
+import asyncio
+import io
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import controller
+
+
+class UploadedArchive(io.BytesIO):
+    """Arsip dari bytes dengan atribut name, meniru objek upload Streamlit."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+class AnalysisJob:
+    """
+    Satu arsip yang dianalisis oleh AnalysisService.
+    status: "queued", "running", "done", "failed", atau "cancelled".
+    """
+
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.status = "queued"
+        self.files_done = 0
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._task = None
+
+    def cancel(self):
+        """Minta job berhenti; file yang sedang dianalisis diselesaikan dulu. Aman dari thread mana pun."""
+        self._cancel.set()
+
+
+class AnalysisService:
+    """
+    Layanan analisis asyncio untuk banyak arsip sekaligus, dengan queue lokal (tanpa broker).
+    Setiap job menjalankan controller.extract_and_parse di thread pool berukuran
+    max_jobs, jadi arsip yang lambat tidak memblokir event loop maupun job lain.
+    Progress per file dikirim sebagai event (dict) ke setiap pembaca events(). Setiap pembaca
+    punya queue sendiri berukuran max_events; jika pembaca tertinggal, event paling lama
+    dibuang, dan event tanpa pembaca langsung dibuang (memori tidak bertambah).
+
+    Event:
+    - {"type": "started", "job": id, "name": nama arsip}
+    - {"type": "file", "job": id, "path": path file, "files_done": n, "error": pesan atau None}
+    - {"type": "done" | "failed" | "cancelled", "job": id, ...}
+    """
+
+    def __init__(self, max_jobs=2, workers=1, cache=None, max_events=1000, **options):
+        self.max_jobs = max_jobs
+        self.workers = workers
+        self.cache = cache
+        self.max_events = max_events
+        self.options = options
+        self.jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="analysis")
+        self._ids = itertools.count(1)
+        self._subscribers = set()  # asyncio.Queue per pembaca events()
+        self._loop = None
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+
+    def _dispatch(self, event):
+        # Berjalan di event loop
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _publish(self, event):
+        # Bisa dipanggil dari thread pool: event dibagikan ke pembaca lewat event loop
+        self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _run(self, job, file):
+        # Berjalan di thread pool
+        if job._cancel.is_set():
+            raise controller.AnalysisCancelled()
+        job.status = "running"
+        self._publish({"type": "started", "job": job.id, "name": job.name})
+
+        def progress(record):
+            job.files_done += 1
+            error = record["rows"][0].error if record["package"] is None else None
+            self._publish({"type": "file", "job": job.id, "path": record["path"],
+                           "files_done": job.files_done, "error": error})
+
+        return controller.extract_and_parse(file, workers=self.workers, cache=self.cache, progress=progress,
+                                            cancel=job._cancel, **self.options)
+
+    async def _execute(self, job, file):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run, job, file)
+        try:
+            # shield: saat task dibatalkan, thread tetap ditunggu sampai berhenti di batas file
+            job.result = await asyncio.shield(future)
+        except (asyncio.CancelledError, controller.AnalysisCancelled):
+            job._cancel.set()
+            try:
+                await future
+            except Exception:
+                pass
+            job.status = "cancelled"
+            self._publish({"type": "cancelled", "job": job.id, "files_done": job.files_done})
+            raise controller.AnalysisCancelled()
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            self._publish({"type": "failed", "job": job.id, "error": job.error})
+            raise
+        job.status = "done"
+        self._publish({"type": "done", "job": job.id, "files_done": job.files_done, "rows": len(job.result)})
+        return job.result
+
+    async def submit(self, file, name=None):
+        """
+        Daftarkan satu arsip (objek upload dengan name/getbuffer, atau bytes + name).
+        Return AnalysisJob; hasilnya diambil dengan await service.result(job).
+        """
+        self._ensure_loop()
+        if isinstance(file, (bytes, bytearray)):
+            file = UploadedArchive(file, name or "upload.zip")
+        job = AnalysisJob(next(self._ids), name or getattr(file, "name", None))
+        job._task = asyncio.ensure_future(self._execute(job, file))
+        self.jobs[job.id] = job
+        return job
+
+    async def submit_many(self, files):
+        """Daftarkan beberapa arsip sekaligus; files berisi objek upload atau (bytes, name)."""
+        jobs = []
+        for file in files:
+            if isinstance(file, tuple):
+                jobs.append(await self.submit(*file))
+            else:
+                jobs.append(await self.submit(file))
+        return jobs
+
+    async def result(self, job):
+        """DataFrame hasil job (format sama dengan extract_and_parse); AnalysisCancelled jika dibatalkan."""
+        return await asyncio.shield(job._task)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def events(self):
+        """
+        Async iterator event progress dari semua job, mulai dari saat events() dipanggil.
+        Panggil sebelum submit agar event "started" tidak terlewat.
+        """
+        self._ensure_loop()
+        queue = asyncio.Queue(maxsize=self.max_events)
+        self._subscribers.add(queue)
+        return self._iter_events(queue)
+
+    async def _iter_events(self, queue):
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
+
+    async def wait_all(self):
+        """Tunggu semua job selesai (termasuk yang gagal atau dibatalkan)."""
+        tasks = [job._task for job in self.jobs.values()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        await self.wait_all()
+        self._executor.shutdown(wait=True)
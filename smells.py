@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+# Threshold default mengikuti nilai Lanza & Marinescu (Object-Oriented Metrics in Practice)
+# untuk Java; bisa di-override per project lewat argumen thresholds.
+DEFAULT_THRESHOLDS = {
+    # God Class: WMC (jumlah CC method di class) sangat tinggi dan class panjang
+    "god_class_wmc": 47,
+    "god_class_locnamm": 176,
+    # Brain Method: method panjang, kompleks, bersarang dalam, dan memakai banyak atribut
+    "brain_method_loc": 65,
+    "brain_method_cc": 4,
+    "brain_method_nesting": 3,
+    "brain_method_noav": 7,
+    # Feature Envy (pendekatan): banyak memanggil method lain tapi hampir tidak memakai atribut sendiri
+    "feature_envy_cm": 4,
+    "feature_envy_noav": 1,
+    # Message Chains: panjang chain method call
+    "message_chain_length": 3,
+}
+
+
+def _column(df, name):
+    return df[name].to_numpy(dtype=np.float64, na_value=0)
+
+
+def _has_noav(df):
+    # Baris mode "lexical" tidak punya NOAV (selalu 0), rule yang memakai NOAV melewatinya
+    if "Mode" not in df:
+        return np.ones(len(df), dtype=bool)
+    return df["Mode"].to_numpy(dtype=object) != "lexical"
+
+
+def god_class(df, thresholds):
+    """
+    God Class per class (semua baris method di class ikut ditandai): WMC >= god_class_wmc
+    dan LOCNAMM_type >= god_class_locnamm. WMC diambil dari kolom WMC_type, yang dihitung
+    per file sumber; class dengan nama sama di file berbeda (flavor, salinan di build/)
+    tidak digabung. DataFrame lama tanpa WMC_type memakai groupby Package/Class.
+    """
+    if "WMC_type" in df:
+        wmc = _column(df, "WMC_type")
+    else:
+        wmc = df.groupby(["Package", "Class"], observed=True, sort=False)["CC"].transform("sum").to_numpy(
+            dtype=np.float64, na_value=0)
+    return (wmc >= thresholds["god_class_wmc"]) & (_column(df, "LOCNAMM_type") >= thresholds["god_class_locnamm"])
+
+
+def brain_method(df, thresholds):
+    return ((_column(df, "LOC") > thresholds["brain_method_loc"])
+            & (_column(df, "CC") >= thresholds["brain_method_cc"])
+            & (_column(df, "Max Nesting") >= thresholds["brain_method_nesting"])
+            & (_column(df, "NOAV") > thresholds["brain_method_noav"])
+            & _has_noav(df))
+
+
+def feature_envy(df, thresholds):
+    """
+    Pendekatan Feature Envy: ATFD/LAA/FDP tidak tersedia di tabel metrik, jadi dipakai
+    CM (banyak memanggil method lain) dan NOAV (hampir tidak memakai atribut class sendiri).
+    Fungsi top-level tidak dihitung.
+    """
+    return ((_column(df, "CM") >= thresholds["feature_envy_cm"])
+            & (_column(df, "NOAV") <= thresholds["feature_envy_noav"])
+            & (df["Class"].to_numpy(dtype=object) != "TopLevel")
+            & _has_noav(df))
+
+
+def message_chains(df, thresholds):
+    return _column(df, "MaMCL") >= thresholds["message_chain_length"]
+
+
+# Nama smell -> fungsi rule(df, thresholds) yang mengembalikan array boolean per baris.
+# Tambahkan entry baru untuk rule sendiri.
+DEFAULT_RULES = {
+    "God Class": god_class,
+    "Brain Method": brain_method,
+    "Feature Envy": feature_envy,
+    "Message Chains": message_chains,
+}
+
+
+def _evaluable(df):
+    # Baris TOTAL dan baris Error/None/Lexical tidak dievaluasi
+    return (df["Package"].to_numpy(dtype=object) != "TOTAL") & df["Error"].isna().to_numpy()
+
+
+def detect_smells(df, thresholds=None, rules=None):
+    """
+    Evaluasi semua rule secara vektor atas DataFrame hasil extract_and_parse (atau batch
+    dari extract_to_file). Return DataFrame boolean dengan satu kolom per smell dan
+    index yang sama dengan df.
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    rules = DEFAULT_RULES if rules is None else rules
+    valid = _evaluable(df)
+    return pd.DataFrame({name: rule(df, thresholds) & valid for name, rule in rules.items()}, index=df.index)
+
+
+def smell_findings(df, flags):
+    """Bentuk panjang: satu baris (Package, Class, Method, Smell) per temuan."""
+    matrix = flags.to_numpy()
+    rows, columns = np.nonzero(matrix)
+    return pd.DataFrame({
+        "Package": df["Package"].to_numpy(dtype=object)[rows],
+        "Class": df["Class"].to_numpy(dtype=object)[rows],
+        "Method": df["Method"].to_numpy(dtype=object)[rows],
+        "Smell": np.asarray(flags.columns, dtype=object)[columns],
+    })
+
+
+class SmellEvaluator:
+    """
+    Evaluasi smell bertahap untuk batch yang di-stream (misalnya dari extract_to_file).
+    Setiap batch dievaluasi secara vektor; yang disimpan hanya jumlah per smell dan
+    daftar temuan, bukan seluruh baris. God Class memakai WMC_type yang sudah dihitung
+    per file, jadi tidak bergantung pada pembagian batch.
+    """
+
+    def __init__(self, thresholds=None, rules=None, keep_findings=True):
+        self.thresholds = thresholds
+        self.rules = rules
+        self.keep_findings = keep_findings
+        self.rows = 0
+        self.counts = {}
+        self._findings = []
+
+    def add(self, df):
+        """Evaluasi satu batch; return DataFrame boolean smell untuk batch tersebut."""
+        flags = detect_smells(df, self.thresholds, self.rules)
+        self.rows += len(df)
+        for name, count in flags.sum().items():
+            self.counts[name] = self.counts.get(name, 0) + int(count)
+        if self.keep_findings and flags.to_numpy().any():
+            self._findings.append(smell_findings(df, flags))
+        return flags
+
+    def findings(self):
+        if not self._findings:
+            return pd.DataFrame(columns=["Package", "Class", "Method", "Smell"])
+        return pd.concat(self._findings, ignore_index=True)
+
+    def summary(self):
+        return {"rows": self.rows, "smells": dict(self.counts)}
@@ -0,0 +1,215 @@
+import io
+import os
+import tempfile
+import zipfile
+
+import controller
+
+MAIN = """package app.ui
+
+import app.data.Repo
+import app.util.*
+
+class Main {
+    override fun onCreate() {
+        super.onCreate()
+        load()
+        repo.fetch()
+        util()
+    }
+
+    fun load() {}
+}
+"""
+
+SOURCES = {
+    "app/ui/Main.kt": MAIN,
+    "app/ui/Second.kt": "package app.ui\n\nclass Second {\n    fun onCreate() {}\n}\n",
+    "app/data/Repo.kt": "package app.data\n\nclass Repo {\n    fun fetch() {}\n}\n\nclass Cache {\n    fun fetch() {}\n}\n",
+    "app/other/Repo.kt": "package app.other\n\nclass Repo {\n    fun fetch() {}\n    fun fetch(x: Int) {}\n}\n",
+    "app/util/Util.kt": "package app.util\n\nfun util() {}\n",
+}
+
+
+def _cm(mode, cm_scope):
+    with tempfile.TemporaryDirectory() as folder:
+        sources = [(os.path.join(folder, path), code) for path, code in SOURCES.items()]
+        records = controller.analyze_kotlin_sources(sources, mode=mode)
+    if cm_scope == "project":
+        records = controller.apply_project_cm(records)
+    return {(row.owner.name, row.name): row.cm for record in records for row in record["rows"]}
+
+
+def test_project_cm_uses_package_and_imports():
+    for mode in ("parsed", "lexical"):
+        file_cm = _cm(mode, "file")
+        project_cm = _cm(mode, "project")
+        # fetch: hanya app.data.Repo yang di-import (bukan Cache atau app.other.Repo),
+        # util: import wildcard app.util.*, onCreate: override di file sendiri, tidak ditambah
+        assert project_cm["Main", "onCreate"] - file_cm["Main", "onCreate"] == 2, mode
+        assert project_cm["Second", "onCreate"] == file_cm["Second", "onCreate"], mode
+
+
+def test_record_imports():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "Main.kt")
+        for mode in ("parsed", "lexical"):
+            record = controller.analyze_kotlin_sources([(path, MAIN)], mode=mode)[0]
+            assert record["imports"] == ["app.data.Repo", "app.util.*"], mode
+
+
+def test_analyze_git_diff_working_tree(tmp_path):
+    import subprocess
+
+    def git(*args):
+        env = dict(os.environ, GIT_AUTHOR_NAME="t", GIT_AUTHOR_EMAIL="t@t", GIT_COMMITTER_NAME="t",
+                   GIT_COMMITTER_EMAIL="t@t")
+        return subprocess.run(["git", "-C", str(tmp_path), *args], env=env, check=True, capture_output=True,
+                              text=True).stdout.strip()
+
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "A.kt").write_text("package app\n\nclass A {\n    fun a() = 1\n}\n")
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-q", "-m", "init")
+    (tmp_path / "app" / "B.kt").write_text("package app\n\nclass B {\n    fun b() = 2\n}\n")
+
+    # repo_dir subfolder: path tetap relatif terhadap root repo, file untracked ikut dianalisis
+    index = controller.analyze_git_diff(str(tmp_path / "app"), "HEAD")
+    assert index.changed_paths == ["app/B.kt"]
+    assert sorted(index.records) == ["app/A.kt", "app/B.kt"]
+
+    index = controller.analyze_git_diff(str(tmp_path), "HEAD", "HEAD")
+    assert index.revision == git("rev-parse", "HEAD")
+    git("commit", "-q", "--allow-empty", "-m", "next")
+    try:
+        controller.analyze_git_diff(str(tmp_path), "HEAD", "HEAD", index=index)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("index untuk commit lama dipakai untuk HEAD yang sudah bergeser")
+
+
+def test_dedup_progress_reports_every_copy():
+    code = "package a\n\nclass A {\n    fun f() = 1\n}\n"
+    sources = [(f"a{i}/A.kt", code) for i in range(3)] + [("b/B.kt", code.replace("A", "B"))]
+    seen = []
+    records = controller.analyze_kotlin_sources(sources, progress=lambda record: seen.append(record["path"]),
+                                                dedup=True)
+    assert sorted(seen) == sorted(path for path, _ in sources)
+    assert [record["path"] for record in records] == [path for path, _ in sources]
+
+
+def test_extracted_method_returns_row_dicts(tmp_path):
+    import pandas as pd
+
+    path = tmp_path / "A.kt"
+    path.write_text("package a\n\nclass A {\n    fun f() = 1\n    fun g() { if (true) f() }\n}\n")
+    rows = controller.extracted_method(str(path))
+    assert [row["Method"] for row in rows] == ["f", "g"]
+    assert rows[1]["CC"] == 2 and rows[1]["NOMNAMM_Package"] == 2
+    assert list(pd.DataFrame(rows).columns) == controller.METRIC_COLUMNS
+
+
+class _Upload(io.BytesIO):
+    name = "upload.zip"
+
+
+def _zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, code in files.items():
+            archive.writestr(name, code)
+    return _Upload(buffer.getvalue())
+
+
+def test_error_frames_have_full_schema():
+    for upload in (_zip({"README.md": "no kotlin"}), _Upload(b"not an archive")):
+        df = controller.extract_and_parse(upload)
+        assert list(df.columns) == controller.METRIC_COLUMNS
+        assert df.loc[0, "Package"] == "Error" and df.loc[0, "LOC"] == 0
+        assert df.loc[0, "Mode"] == "parsed"
+
+
+SMALL = "package s\n\nclass S {\n    fun f(x: Int) = if (x > 0) 1 else 2\n}\n"
+# Cukup besar supaya parse kopyt jauh lebih lama dari parse_timeout di bawah
+LARGE = "package big\n\nclass Big {\n" + "".join(
+    f"    fun m{i}(x: Int): Int {{ if (x > {i}) {{ return x + {i} }} else {{ return x * {i} }} }}\n"
+    for i in range(1500)) + "}\n"
+
+
+def _crash_on_marker(real):
+    def analyze(file_path, code=None, *args, **kwargs):
+        if "crash" in file_path:
+            os._exit(3)  # Worker mati tanpa mengirim hasil (EOFError di parent)
+        return real(file_path, code, *args, **kwargs)
+    return analyze
+
+
+def test_parse_timeout_and_worker_crash_keep_order(monkeypatch):
+    import multiprocessing
+
+    import kopyt  # noqa: F401  (sudah ter-import sebelum worker di-fork)
+
+    # Worker di-fork dari proses ini, jadi fungsi yang di-patch ikut terpakai di worker
+    monkeypatch.setattr(controller, "analyze_kotlin_file", _crash_on_marker(controller.analyze_kotlin_file))
+    sources = [("a/S1.kt", SMALL), ("b/Big.kt", LARGE), ("c/S2.kt", SMALL), ("d/crash.kt", SMALL),
+               ("e/S3.kt", SMALL)]
+    records = controller.analyze_kotlin_sources(sources, workers=2, parse_timeout=1.0)
+
+    assert [record["path"] for record in records] == [path for path, _ in sources]
+    assert records[1]["limit"] == "Parse timeout after 1.0s"
+    assert records[1]["rows"][0].error == "Parse timeout after 1.0s"
+    assert records[3]["limit"] == "Worker exited with code 3"
+    for i in (0, 2, 4):
+        assert "limit" not in records[i] and records[i]["rows"][0].name == "f"
+    assert multiprocessing.active_children() == []
+
+
+def test_parse_timeout_lexical_fallback():
+    records = controller.analyze_kotlin_sources([("b/Big.kt", LARGE), ("a/S.kt", SMALL)], parse_timeout=1.0,
+                                                on_limit="lexical")
+    assert records[0]["limit"].startswith("Parse timeout")
+    assert len(records[0]["rows"]) == 1500 and records[0]["rows"][0].mode == "lexical"
+    assert records[1]["rows"][0].mode == "parsed"
+
+
+def test_analysis_pool_reuses_workers():
+    import multiprocessing
+
+    sources = [(f"p{i}/S.kt", SMALL) for i in range(4)]
+    with controller.AnalysisPool(2) as pool:
+        first = controller.analyze_kotlin_sources(sources, parse_timeout=30, pool=pool)
+        pids = sorted(process.pid for _, process in pool._idle)
+        second = controller.analyze_kotlin_sources(sources, parse_timeout=30, pool=pool)
+        assert sorted(process.pid for _, process in pool._idle) == pids
+        assert len(pids) == 2
+    assert [record["rows"] for record in first] == [record["rows"] for record in second]
+    assert multiprocessing.active_children() == []
+
+
+def test_parallel_results_equal_serial():
+    import benchmark
+
+    corpus = benchmark.generate_corpus(files=6, classes=2, methods=4)
+    serial = controller.build_metrics_dataframe(controller.analyze_kotlin_sources(corpus))
+    parallel = controller.build_metrics_dataframe(controller.analyze_kotlin_sources(corpus, workers=2, chunksize=1))
+    assert serial.equals(parallel)
+
+
+def test_compare_archives_classifies_changes():
+    old = _zip({
+        "a/A.kt": "package a\n\nclass A {\n    fun f() = 1\n    fun gone() = 2\n}\n",
+        "b/Same.kt": SMALL,
+    })
+    new = _zip({
+        "a/A.kt": "package a\n\nclass A {\n    fun f(x: Int) = if (x > 0) 1 else 2\n    fun added() = 3\n}\n",
+        "b/Same.kt": SMALL,
+    })
+    diff = controller.compare_archives(old, new)
+    status = dict(zip(diff["Method"], diff["Status"]))
+    assert status == {"added": "added", "f": "changed", "gone": "removed"}
+    changed = diff[diff["Method"] == "f"].iloc[0]
+    assert changed["CC_old"] == 1 and changed["CC_new"] == 2 and changed["CC_delta"] == 1
+    assert diff.attrs["files"]["unchanged"] == 1
+    assert diff.attrs["files"]["changed"] == ["a/A.kt"]
@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from metric_cache import MetricCache
+
+
+def _stored_size(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metrics").fetchone()[0]
+
+
+def test_running_total_and_eviction():
+    with tempfile.TemporaryDirectory() as folder:
+        cache = MetricCache(os.path.join(folder, "cache.db"), max_bytes=2000)
+        with cache.batch():
+            for i in range(100):
+                cache.put(f"k{i}", {"i": i, "data": "x" * 20})
+            cache.put("k99", {"i": 99})  # replace: ukuran lama dikurangi
+            assert cache.get("k99") == {"i": 99}
+        assert cache.size() == _stored_size(cache) <= 2000
+        assert cache.get("k0") is None
+        cache.close()
+
+        # Total dihitung ulang saat cache dibuka lagi, isi batch sudah di-commit
+        reopened = MetricCache(os.path.join(folder, "cache.db"), max_bytes=2000)
+        assert reopened.size() == _stored_size(reopened)
+        assert reopened.get("k99") == {"i": 99}
+        reopened.close()
+
+
+def test_recently_used_entry_survives_eviction():
+    with tempfile.TemporaryDirectory() as folder:
+        cache = MetricCache(os.path.join(folder, "cache.db"), max_bytes=200)
+        with cache.batch():
+            cache.put("a", {"data": "x" * 40})
+            cache.put("b", {"data": "x" * 40})
+            cache.get("a")
+            cache.put("c", {"data": "x" * 40})
+            cache.put("d", {"data": "x" * 40})
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        cache.close()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+
+from metrics import kotlin_tokens, method_tokens, strip_comments_and_strings
+
+
+def _strip(code):
+    stripped = strip_comments_and_strings(code)
+    # Panjang dan posisi newline harus tetap sama
+    assert len(stripped) == len(code)
+    assert [i for i, c in enumerate(stripped) if c == "\n"] == [i for i, c in enumerate(code) if c == "\n"]
+    return stripped
+
+
+def test_strip_keeps_template_code():
+    code = 'fun show() = "c=$count ${helper()} ${this.count}"'
+    assert _strip(code) == 'fun show() = "   count   helper()    this.count "'
+
+
+def test_strip_nested_string_in_template():
+    code = 'val q = "${foo("bar${baz}")}"'
+    assert _strip(code) == 'val q = "  foo("     baz ") "'
+
+
+def test_strip_template_with_braces_and_char_literal():
+    assert _strip('val s = "${xs.map { it }}!"') == 'val s = "  xs.map { it }  "'
+    assert _strip("val p = \"${'}'}\"") == "val p = \"  ' ' \""
+
+
+def test_strip_raw_string():
+    code = 'val r = """a "b"\n$x ${y.z} """"'
+    assert _strip(code) == 'val r = "       \n x   y.z     "'
+
+
+def test_strip_escapes_and_dollar_without_name():
+    assert _strip('val e = "a\\"b$ $1"') == 'val e = "        "'
+
+
+def test_strip_unterminated_string_stops_at_newline():
+    assert _strip('val u = "abc\nnext()') == 'val u = "   \nnext()'
+
+
+def test_strip_nested_block_comment():
+    assert _strip("/* a /* b */ c */ d // e\nf") == "                  d     \nf"
+
+
+def test_strip_char_literals():
+    code = "val a = '\"'; val b = '\\''; val c = '}'; val d = '\\u0041'"
+    assert _strip(code) == "val a = ' '; val b = '  '; val c = ' '; val d = '      '"
+
+
+def test_tokenize():
+    tokens, starts = kotlin_tokens(_strip('a?.b!!.c(1.5.toInt()) -> `x y` @Ann "s$t"'))
+    assert tokens == ["a", "?.", "b", "!!", ".", "c", "(", "1.5", ".", "toInt", "(", ")", ")", "->", "`x y`",
+                      "@Ann", '"', "t", '"']
+    assert starts[:3] == [0, 1, 3]
+
+
+def test_method_tokens_template_calls():
+    stream = method_tokens('fun show() = "${helper()} $count ${this.count}"')
+    assert "helper" in stream.call_sites()
+    identifiers = stream.identifiers()
+    assert "count" in identifiers.direct
+    assert "count" in identifiers.qualified
+
+
+def test_template_metrics_parsed():
+    import controller
+
+    code = 'class A { private var count = 0; fun helper() = 1; fun show() = "c=$count ${helper()} ${this.count}" }'
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "A.kt")
+        with open(path, "w") as f:
+            f.write(code)
+        rows = {row.name: row for row in controller.analyze_kotlin_file(path)["rows"]}
+    assert rows["show"].noav == 1
+    assert rows["show"].cm == 1
+
+
+def test_cfnamm_ignores_calls_in_strings():
+    import controller
+
+    code = 'class A {\n    fun foo() { val s = "bar()" }\n    fun bar() {}\n    fun baz() { bar() }\n}\n'
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "A.kt")
+        with open(path, "w") as f:
+            f.write(code)
+        rows = {row.name: row for row in controller.analyze_kotlin_file(path)["rows"]}
+    assert rows["foo"].cm == 0
+    # Hanya baz yang benar-benar memanggil method lain di class
+    assert rows["foo"].owner.cfnamm_type == 1 / 3
@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+import controller
+from smells import detect_smells
+
+
+def test_god_class_wmc_is_per_file():
+    # Class yang sama di dua file (misalnya salinan di build/intermediates) tidak menggandakan WMC
+    branches = "\n".join(f"        if (x == {i}) y++" for i in range(29))
+    code = f"package app\n\nclass Big {{\n    fun run(x: Int) {{\n        var y = 0\n{branches}\n    }}\n}}\n"
+    with tempfile.TemporaryDirectory() as folder:
+        sources = [(os.path.join(folder, "src", "Big.kt"), code),
+                   (os.path.join(folder, "build", "intermediates", "Big.kt"), code)]
+        df = controller.build_metrics_dataframe(controller.analyze_kotlin_sources(sources))
+    rows = df[df["Class"] == "Big"]
+    assert rows["CC"].tolist() == [30, 30]
+    assert rows["WMC_type"].tolist() == [30, 30]
+
+    flags = detect_smells(df, {"god_class_wmc": 40, "god_class_locnamm": 0})
+    assert not flags["God Class"].any()
+    flags = detect_smells(df, {"god_class_wmc": 30, "god_class_locnamm": 0})
+    assert flags.loc[rows.index, "God Class"].all()
@@ -0,0 +1,10 @@
+import watcher
+
+
+def test_watcher_keeps_source_packages_named_build(tmp_path):
+    folder = tmp_path / "src" / "main" / "kotlin" / "com" / "acme" / "build"
+    folder.mkdir(parents=True)
+    (folder / "Config.kt").write_text("package com.acme.build\n\nclass Config {\n    fun a() = 1\n}\n")
+    index = watcher.MetricsWatcher(str(tmp_path), mode="lexical")
+    index.refresh()
+    assert index.files() == ["src/main/kotlin/com/acme/build/Config.kt"]
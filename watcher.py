@@ -0,0 +1,219 @@
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import controller
+
+
+class MetricsWatcher:
+    """
+    Mode watch untuk folder project lokal: semua file Kotlin dianalisis sekali, lalu
+    record per file dan agregat package disimpan di memori (controller.ProjectIndex).
+    Perubahan dideteksi dengan polling stat file (mtime dan ukuran) setiap interval detik;
+    hanya file yang berubah yang dianalisis ulang, dan query dijawab dari index di memori.
+
+    Polling cukup murah untuk ribuan file (satu stat per file, pola exclude hanya dicek
+    untuk path baru), dan tidak butuh dependency tambahan seperti inotify/watchdog.
+    File yang mtime-nya berubah tapi isinya sama (hash konten) tidak dianalisis ulang.
+
+    exclude sama seperti extract_and_parse (default None: semua file Kotlin ikut). Pola
+    controller.DEFAULT_EXCLUDES juga cocok dengan package sumber bernama build/generated,
+    jadi hanya dipakai jika diminta.
+
+    on_update(changes) dipanggil (dari thread watcher) setiap ada perubahan, dengan dict:
+    {"changed": [path], "removed": [path], "packages": set package terpengaruh, "seconds": durasi}
+    """
+
+    def __init__(self, root, cache=None, workers=1, exclude=None, interval=0.5,
+                 mode="parsed", cm_scope="file", on_update=None):
+        if isinstance(cache, str):
+            cache = controller.MetricCache(cache)
+        self.root = os.path.abspath(root)
+        self.cache = cache
+        self.workers = workers
+        self.exclude = exclude
+        self.interval = interval
+        self.mode = mode
+        self.cm_scope = cm_scope
+        self.on_update = on_update
+        self.index = controller.ProjectIndex()
+        self.last_error = None
+        self._stats = {}  # path relatif -> (mtime_ns, ukuran)
+        self._digests = {}  # path relatif -> hash isi file yang terakhir dianalisis
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self):
+        """Stat semua file Kotlin di root: dict path relatif (pemisah "/") -> (mtime_ns, ukuran)."""
+        known = self._stats
+        stats = {}
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            try:
+                entries = os.scandir(os.path.join(self.root, rel_dir))
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != ".git" and not controller.is_excluded(rel_path + "/", self.exclude):
+                                pending.append(rel_path)
+                        elif controller.is_kotlin_file(entry.name):
+                            if rel_path not in known and controller.is_excluded(rel_path, self.exclude):
+                                continue
+                            stat = entry.stat()
+                            stats[rel_path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue  # File dihapus di tengah scan
+        return stats
+
+    def refresh(self):
+        """
+        Satu kali polling: scan, analisis ulang file yang berubah, dan perbarui index.
+        Return dict perubahan (lihat on_update), atau None jika tidak ada perubahan.
+        """
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        start = time.perf_counter()
+        current = self.scan()
+        touched = [path for path, stat in current.items() if self._stats.get(path) != stat]
+        removed = [path for path in self._stats if path not in current]
+
+        sources = []
+        digests = {}
+        for path in touched:
+            try:
+                with open(os.path.join(self.root, path), "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue  # Terhapus setelah scan, ditangani di polling berikutnya
+            digest = hashlib.sha256(data).digest()
+            if self._digests.get(path) != digest:
+                digests[path] = digest
+                sources.append((path, data))
+
+        # Analisis di luar lock supaya query tetap bisa dijawab dari index lama
+        records = controller.analyze_kotlin_sources(sources, self.workers, cache=self.cache, mode=self.mode)
+
+        affected = set()
+        with self._lock:
+            for path in removed:
+                affected |= self.index.remove(path)
+                self._digests.pop(path, None)
+            for record in records:
+                affected |= self.index.update(record)
+                self._digests[record["path"]] = digests[record["path"]]
+            self.index.changed_paths = [path for path, _ in sources]
+            self.index.affected_packages = affected
+        self._stats = current
+
+        if not sources and not removed:
+            return None
+        changes = {
+            "changed": [path for path, _ in sources],
+            "removed": removed,
+            "packages": affected,
+            "seconds": time.perf_counter() - start,
+        }
+        if self.on_update is not None:
+            self.on_update(changes)
+        return changes
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Watcher tetap jalan; error terakhir bisa dicek dari last_error
+                self.last_error = str(e)
+
+    def start(self):
+        """Analisis awal (blocking), lalu polling di thread background."""
+        if self._thread is not None:
+            return self
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Query dari index di memori ---
+
+    def dataframe(self, paths=None, cm_scope=None):
+        """DataFrame metrik (format sama dengan extract_and_parse), opsional hanya untuk paths."""
+        with self._lock:
+            return self.index.to_dataframe(paths, cm_scope or self.cm_scope)
+
+    def package_metrics(self, package=None):
+        """Metrik package-level (NOMNAMM_Package, NOI_Package, LOC_Package) semua package atau satu package."""
+        with self._lock:
+            metrics = self.index.package_metrics_map()
+        return metrics if package is None else metrics.get(package)
+
+    def file_rows(self, path):
+        """Baris metrik satu file (list dict, lihat MethodMetrics.as_dict), atau None jika tidak ada."""
+        with self._lock:
+            record = self.index.records.get(path)
+            return None if record is None else [row.as_dict() for row in record["rows"]]
+
+    def files(self):
+        with self._lock:
+            return sorted(self.index.records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pantau folder project Kotlin dan perbarui metrik saat file berubah.")
+    parser.add_argument("root", help="folder project")
+    parser.add_argument("--interval", type=float, default=0.5, help="interval polling (detik)")
+    parser.add_argument("--cache", help="file SQLite untuk cache metrik per file")
+    parser.add_argument("--workers", type=int, default=1, help="worker untuk analisis awal")
+    parser.add_argument("--mode", choices=("parsed", "lexical"), default="parsed")
+    parser.add_argument("--default-excludes", action="store_true",
+                        help="lewati folder build/generated (controller.DEFAULT_EXCLUDES)")
+    args = parser.parse_args(argv)
+
+    def report(changes):
+        paths = changes["changed"] + [f"{path} (dihapus)" for path in changes["removed"]]
+        print(f"{len(paths)} file diperbarui dalam {changes['seconds']:.3f}s: {', '.join(paths)}")
+        if changes["packages"]:
+            print(f"  package terpengaruh: {', '.join(sorted(changes['packages']))}")
+
+    watcher = MetricsWatcher(args.root, cache=args.cache, workers=args.workers,
+                             exclude=controller.DEFAULT_EXCLUDES if args.default_excludes else None,
+                             interval=args.interval, mode=args.mode)
+    start = time.perf_counter()
+    watcher.start()
+    print(f"{len(watcher.files())} file dianalisis dalam {time.perf_counter() - start:.1f}s, memantau {watcher.root}")
+    watcher.on_update = report
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())